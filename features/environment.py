@@ -1,12 +1,16 @@
+import json
 import logging
 import os
 import shutil
 import sys
 
+import allure
 from behave.model import Scenario
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
 from methods.api import eps_api_methods
+from methods.shared import attachments, latency, logs, response_schemas
+from utils.run_history import RunHistory
 
 load_dotenv(override=True)
 global _page
@@ -18,6 +22,8 @@ SANDBOX_INT_BASE_URL = "https://sandbox.api.service.nhs.uk/"
 REF_BASE_URL = "https://ref.api.service.nhs.uk/"
 
 LOCALHOST_URL = "http://localhost:3000/"
+# The API stand-ins in stubs/, started with `python -m stubs.server`
+LOCALHOST_API_URL = "http://localhost:9000/"
 
 AWS_BASE_URL = ".eps.national.nhs.uk/"
 PFP_AWS_PR_URL = "https://pfp-{{aws_pull_request_id}}.dev.eps.national.nhs.uk/"
@@ -36,7 +42,7 @@ APIGEE_ENVS = {
     "REF": REF_BASE_URL,
     "INTERNAL-DEV-SANDBOX": SANDBOX_DEV_BASE_URL,
     "SANDBOX": SANDBOX_INT_BASE_URL,
-    "LOCALHOST": LOCALHOST_URL,
+    "LOCALHOST": LOCALHOST_API_URL,
 }
 
 AWS_ENVS = {
@@ -109,13 +115,37 @@ def before_scenario(context, scenario):
         set_page(context, _page)
 
 
+def before_step(context, step):
+    attachments.start_step()
+
+
+def after_step(context, step):
+    context.run_history.record_step(context.scenario, step)
+    attachments.finish_step(step.status.name == "failed")
+
+
+def after_scenario(context, scenario):
+    context.run_history.record_scenario(scenario)
+    api_latency = getattr(context, "api_latency", None)
+    if api_latency:
+        allure.attach(
+            json.dumps(latency.summarise(api_latency), indent=2),
+            "API Latency",
+            allure.attachment_type.JSON,
+        )
+
+
 def before_all(context):
+    setup_logging(context.config.logging_level)
     product = context.config.userdata["product"].upper()
     if count_of_scenarios_to_run(context) != 0:
         env = context.config.userdata["env"].upper()
         print(f"Environment: {env}")
+        context.run_history = RunHistory(
+            product, env, context.config.userdata.get("run_id")
+        )
 
-        # Currently, only the CPT-UI product is supported for local testing
+        # CPT-UI runs against a local dev server, the APIs against the stand-ins
         if env == "LOCALHOST":
             context.cpts_ui_base_url = LOCALHOST_URL
 
@@ -152,6 +182,8 @@ def before_all(context):
         )
 
     eps_api_methods.calculate_eps_fhir_base_url(context)
+    if response_schemas.VALIDATE_RESPONSES:
+        response_schemas.compile_validators()
     print("CPTS-UI: ", context.cpts_ui_base_url)
     print("EPS: ", context.eps_fhir_base_url)
     print("EPS-PRESCRIBING: ", context.eps_fhir_prescribing_base_url)
@@ -242,6 +274,15 @@ def after_all(context):
 
         file_path = "./allure-results/environment.properties"
         write_properties_file(file_path, properties_dict)
+        context.run_history.close()
+        latency_report = latency.write_report(
+            context.config.userdata.get("latency_report", latency.LATENCY_REPORT_PATH)
+        )
+        print(latency.format_summary(latency_report["summary"]))
+        # imported here as common_api_methods imports this module
+        from methods.api.common_api_methods import close_sessions
+
+        close_sessions()
     else:
         directory_path = "./allure-results"
         if os.path.exists(directory_path) and os.path.isdir(directory_path):
@@ -249,16 +290,18 @@ def after_all(context):
             shutil.rmtree(directory_path)
         if _page:
             _page.close()
+    logs.stop_queue_logging()
 
 
 def setup_logging(level: int = logging.INFO):
-    handlers = [logging.StreamHandler(sys.stdout)]
-    logging.basicConfig(
-        format="[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s",
-        datefmt="%m/%d/%Y %I:%M:%S %p",
-        level=level,
-        handlers=handlers,
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(
+        logging.Formatter(
+            "[%(asctime)s] [%(levelname)s] [%(filename)s:%(lineno)d] %(message)s",
+            datefmt="%m/%d/%Y %I:%M:%S %p",
+        )
     )
+    logs.start_queue_logging([handler], level)
 
 
 def select_apigee_base_url(env):
@@ -8,3 +8,11 @@ Feature: I can cancel prescriptions
     When I cancel all line items on the prescription
     Then the response indicates a success
     And the response body indicates a successful cancel action
+
+  Scenario: I can cancel some of the line items on a prescription
+    Given I am an authorised prescriber
+    And I successfully prepare and sign a non-nominated prescription with 3 line items
+    When I cancel line items 1 and 3 on the prescription
+    Then the response indicates a success
+    And the response body indicates a successful cancel action
+    And only line items 1 and 3 are cancelled
@@ -22,3 +22,9 @@ Feature: I can dispense prescriptions
     When I withdraw the dispense notification
     Then the response indicates a success
     And the response body indicates a successful dispense withdrawal action
+
+  Scenario: I can dispense some of the line items on a prescription
+    Given a prescription with 4 line items has been created and released
+    When I dispense line items 2 and 4 of the prescription
+    Then the response indicates a success
+    And the response body indicates a successful dispense action
@@ -0,0 +1,16 @@
+@eps_fhir @regression @prescription_size
+Feature: Request latency against the number of line items on a prescription
+
+  # Each size's requests are reported separately in the API latency summary,
+  # e.g. "POST Task/$release [4 line items]"
+  Scenario Outline: I can create, release and dispense a prescription with <Items> line items
+    Given a prescription with <Items> line items has been created and released
+    When I dispense the prescription
+    Then the response indicates a success
+    And the response body indicates a successful dispense action
+    Examples:
+      | Items |
+      | 1     |
+      | 2     |
+      | 3     |
+      | 4     |
@@ -14,3 +14,10 @@ Feature: I can send an update to PSU
     When I am authorised to send prescription updates
     And I send an Collected update with a terminal status of completed
     Then The prescription item has a status of Collected with a terminal status of completed
+
+  @e2e
+  Scenario: I can send and confirm an update to some of the items on a prescription
+    Given a prescription with 3 line items has been created and released
+    When I am authorised to send prescription updates
+    And I send an Collected update for line items 1 and 3 with a terminal status of completed
+    Then the updated line items have a status of Collected with a terminal status of completed
@@ -3,6 +3,7 @@ from behave import when, then  # pyright: ignore [reportAttributeAccessIssue]
 from methods.shared import common
 from methods.api.common_api_methods import request_ping
 from methods.shared.common import assert_that
+from methods.shared.json_backend import response_json
 
 
 @when('I make a request to the "{product}" ping endpoint')
@@ -43,28 +44,28 @@ def indicate_bad_request_response(context):
 
 @then("I can see the version information in the response")
 def i_see_version_in_response(context):
-    response = context.response.json()
+    response = response_json(context.response)
     assert_that(response["version"]).is_not_none()
     assert_that(response["version"]).is_not_empty()
 
 
 @then("I can see the revision information in the response")
 def i_see_revision_in_response(context):
-    response = context.response.json()
+    response = response_json(context.response)
     assert_that(response["revision"]).is_not_none()
     assert_that(response["revision"]).is_not_empty()
 
 
 @then("I can see the releaseId information in the response")
 def i_see_release_id_in_response(context):
-    response = context.response.json()
+    response = response_json(context.response)
     assert_that(response["releaseId"]).is_not_none()
     assert_that(response["releaseId"]).is_not_empty()
 
 
 @then("I can see the commitId information in the response")
 def i_see_commit_id_in_response(context):
-    response = context.response.json()
+    response = response_json(context.response)
     assert_that(response["commitId"]).is_not_none()
     assert_that(response["commitId"]).is_not_empty()
 
@@ -1,10 +1,11 @@
-import json
+import re
 
 # pylint: disable=no-name-in-module
 from behave import given, when, then  # pyright: ignore [reportAttributeAccessIssue]
 from features.steps.common_steps import indicate_successful_response
 from methods.api.eps_api_methods import (
     cancel_all_line_items,
+    cancel_line_items,
     create_signed_prescription,
     dispense_prescription,
     amend_dispense_notification,
@@ -15,9 +16,11 @@ from methods.api.eps_api_methods import (
     call_validator,
 )
 from methods.shared.common import assert_that, get_auth
+from methods.shared.fhir_path import select, select_one
+from methods.shared.json_backend import dumps, load_file, response_json
+from methods.shared.json_diff import diff_json, format_differences
 from utils.random_nhs_number_generator import generate_single
 from messages.eps_fhir.prescription import Prescription
-from jycm.jycm import YouchamaJsonDiffer
 
 
 @given("I successfully prepare and sign a prescription")
@@ -37,6 +40,41 @@ def i_prepare_and_sign_a_type_prescription(context, prescription_type):
     i_sign_a_new_prescription(context=context)
 
 
+@given(
+    "I successfully prepare and sign a {prescription_type} prescription with {line_item_count:d} line items"
+)
+def i_prepare_and_sign_a_prescription_with_line_items(
+    context, prescription_type, line_item_count
+):
+    set_line_item_count(context, line_item_count)
+    i_prepare_and_sign_a_type_prescription(context, prescription_type)
+
+
+@given(
+    "a prescription with {line_item_count:d} line items has been created and released"
+)
+def a_prescription_with_line_items_has_been_created_and_released(
+    context, line_item_count
+):
+    if "sandbox" in context.config.userdata["env"].lower():
+        return
+    set_line_item_count(context, line_item_count)
+    a_prescription_has_been_created_and_released(context)
+
+
+def set_line_item_count(context, line_item_count):
+    context.line_item_count = line_item_count
+    # the scenario's requests are timed separately for each prescription size
+    context.latency_group = (
+        "1 line item" if line_item_count == 1 else f"{line_item_count} line items"
+    )
+
+
+def parse_item_numbers(item_numbers):
+    # "1, 2 and 4" -> [1, 2, 4]
+    return [int(item_number) for item_number in re.findall(r"\d+", item_numbers)]
+
+
 @given("a prescription has been created and released")
 def a_prescription_has_been_created_and_released(context):
     if "sandbox" in context.config.userdata["env"].lower():
@@ -97,6 +135,18 @@ def i_cancel_all_line_items(context):
     cancel_all_line_items(context)
 
 
+@when("I cancel line items {item_numbers} on the prescription")
+def i_cancel_line_items(context, item_numbers):
+    cancel_line_items(context, parse_item_numbers(item_numbers))
+
+
+@when("I dispense line items {item_numbers} of the prescription")
+def i_dispense_line_items(context, item_numbers):
+    if "sandbox" in context.config.userdata["env"].lower():
+        return
+    dispense_prescription(context, parse_item_numbers(item_numbers))
+
+
 @when("I dispense the prescription")
 def i_dispense_the_prescription(context):
     if "sandbox" in context.config.userdata["env"].lower():
@@ -127,16 +177,12 @@ def body_indicates_successful_action(context, action_type):
         i_can_see_an_informational_operation_outcome_in_the_response(context)
 
     def _cancel_assertion():
-        entries = json_response["entry"]
-        medication_request = [
-            entry
-            for entry in entries
-            if entry["resource"]["resourceType"] == "MedicationRequest"
-        ][0]
         assert_that(
-            medication_request["resource"]["extension"][0]["extension"][0][
-                "valueCoding"
-            ]["display"]
+            select_one(
+                context.response,
+                "entry(MedicationRequest)[0].extension[0].extension[0]"
+                ".valueCoding.display",
+            )
         ).is_equal_to("Prescription/item was cancelled")
 
     def _dispense_assertion():
@@ -146,12 +192,13 @@ def body_indicates_successful_action(context, action_type):
         i_can_see_an_informational_operation_outcome_in_the_response(context)
 
     def _release_assertion():
-        assert_that(json_response["parameter"][0]["resource"]["total"]).is_equal_to(1)
+        assert_that(
+            select_one(context.response, "parameter[0].resource.total")
+        ).is_equal_to(1)
 
     def _return_assertion():
         i_can_see_an_informational_operation_outcome_in_the_response(context)
 
-    json_response = json.loads(context.response.content)
     action_assertions = {
         "cancel": [_cancel_assertion],
         "dispense": [_dispense_assertion],
@@ -163,9 +210,23 @@ def body_indicates_successful_action(context, action_type):
     [assertion() for assertion in action_assertions.get(action_type, [])]
 
 
+@then("only line items {item_numbers} are cancelled")
+def only_line_items_are_cancelled(context, item_numbers):
+    if "sandbox" in context.config.userdata["env"].lower():
+        return
+    expected_item_ids = [
+        context.prescription_item_ids[item_number - 1]
+        for item_number in parse_item_numbers(item_numbers)
+    ]
+    cancelled_item_ids = select(
+        context.response, "entry(MedicationRequest).identifier[0].value"
+    )
+    assert_that(cancelled_item_ids).is_equal_to(expected_item_ids)
+
+
 @then("I can see an informational operation outcome in the response")
 def i_can_see_an_informational_operation_outcome_in_the_response(context):
-    json_response = json.loads(context.response.content)
+    json_response = response_json(context.response)
     assert_that(json_response["resourceType"]).is_equal_to("OperationOutcome")
     assert_that(json_response["issue"][0]["code"]).is_equal_to("informational")
     assert_that(json_response["issue"][0]["severity"]).is_equal_to("information")
@@ -188,14 +249,13 @@ def i_make_a_request_to_the_validator_endpoint(
 
 @when("I make a request with file {filename} to the {product} validator endpoint")
 def i_make_a_request_to_the_validator_endpoint_with_file(context, filename, product):
-    with open(f"messages/examples/{filename}") as f:
-        validate_body = json.load(f)
-    call_validator(context, product, "unset", json.dumps(validate_body))
+    validate_body = load_file(f"messages/examples/{filename}")
+    call_validator(context, product, "unset", dumps(validate_body))
 
 
 @then("the validator response has {expected_issue_count} {issue_type} issue")
 def validator_response_has_n_issues_of_type(context, expected_issue_count, issue_type):
-    json_response = json.loads(context.response.content)
+    json_response = response_json(context.response)
     assert_that(json_response["resourceType"]).is_equal_to("OperationOutcome")
     actual_issue_count = sum(
         p["severity"] == issue_type for p in json_response["issue"]
@@ -208,7 +268,7 @@ def validator_response_has_n_issues_of_type(context, expected_issue_count, issue
 
 @then("the validator response has error with diagnostic containing {diagnostic}")
 def validator_response_has_error_issue_with_diagnostic(context, diagnostic):
-    json_response = json.loads(context.response.content)
+    json_response = response_json(context.response)
     assert_that(json_response["resourceType"]).is_equal_to("OperationOutcome")
     print(f"expected diagnostic: {diagnostic}")
     actual_issue_count = sum(
@@ -220,12 +280,10 @@ def validator_response_has_error_issue_with_diagnostic(context, diagnostic):
 
 @then("the validator response matches {filename}")
 def validator_response_matches_file(context, filename):
-    with open(f"messages/examples/{filename}") as f:
-        expected_response = json.load(f)
-    json_response = json.loads(context.response.content)
-    # create the YouChaMa (ycm) json diff class with expected and actual response
-    ycm = YouchamaJsonDiffer(expected_response, json_response)
-    # get the differences
-    diff_result = ycm.get_diff()
-    # and there should be none
-    assert_that(diff_result).is_equal_to({"just4vis:pairs": []})
+    expected_response = load_file(f"messages/examples/{filename}")
+    json_response = response_json(context.response)
+    # stop at the first difference, and only list them all when there is one
+    differences = diff_json(expected_response, json_response, fast=True)
+    if differences:
+        differences = diff_json(expected_response, json_response)
+    assert_that(format_differences(differences)).is_empty()
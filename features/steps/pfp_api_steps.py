@@ -1,10 +1,9 @@
-import json
-
 # pylint: disable=no-name-in-module
 from behave import when, then  # pyright: ignore [reportAttributeAccessIssue]
 
 from methods.api.pfp_api_methods import get_prescriptions
 from methods.shared.common import assert_that, get_auth
+from methods.shared.fhir_path import select_one
 
 
 @when("I am authenticated")
@@ -27,11 +26,7 @@ def i_request_my_prescriptions(context):
 
 @then("I can see my prescription")
 def i_can_see_my_prescription(context):
-    json_response = json.loads(context.response.content)
-    entries = json_response["entry"]
-    bundle = [
-        entry for entry in entries if entry["resource"]["resourceType"] == "Bundle"
-    ][0]["resource"]["entry"][0]["resource"]
+    bundle = select_one(context.response, "entry(Bundle)[0].entry[0].resource")
     if "sandbox" in context.config.userdata["env"].lower():
         assert_that(bundle["subject"]["identifier"]["value"]).is_equal_to("9449304130")
         assert_that(bundle["groupIdentifier"]["value"]).is_equal_to(
@@ -1,16 +1,20 @@
-import json
 import logging
 import uuid
 
 # pylint: disable=no-name-in-module
 from behave import given, when, then  # pyright: ignore [reportAttributeAccessIssue]
 
-from features.steps import pfp_api_steps
+from features.steps import eps_api_steps, pfp_api_steps
 from methods.api.psu_api_methods import send_status_update
 from methods.shared.common import get_auth, assert_that
+from methods.shared.fhir_path import compile_path, select, select_one
+from methods.shared.logs import LogBody
 from utils.prescription_id_generator import generate_short_form_id
 from utils.random_nhs_number_generator import generate_single
 
+# the status of a line item on the patient's prescription
+ITEM_STATUS_PATH = "extension[0].extension[0].valueCoding.code"
+
 
 @given("I am authorised to send prescription updates")
 @when("I am authorised to send prescription updates")
@@ -27,6 +31,7 @@ def i_send_an_update(context, status, terminal):
         context.receiver_ods_code = "FA565"
         context.prescription_id = generate_short_form_id(context.receiver_ods_code)
         context.prescription_item_id = uuid.uuid4()
+        context.prescription_item_ids = [context.prescription_item_id]
         context.nhs_number = generate_single()
     context.terminal_status = terminal
     context.item_status = status
@@ -34,6 +39,16 @@ def i_send_an_update(context, status, terminal):
     send_status_update(context)
 
 
+@when(
+    "I send an {status} update for line items {item_numbers} with a terminal status of {terminal}"
+)
+def i_send_an_update_for_line_items(context, status, item_numbers, terminal):
+    context.terminal_status = terminal
+    context.item_status = status
+    context.updated_item_numbers = eps_api_steps.parse_item_numbers(item_numbers)
+    send_status_update(context, context.updated_item_numbers)
+
+
 @then(
     "The prescription item has a status of Collected with a terminal status of completed"
 )
@@ -42,18 +57,37 @@ def prescription_has_status_with_terminal_status(context):
         return
     pfp_api_steps.i_am_authenticated(context)
     pfp_api_steps.i_request_my_prescriptions(context)
-    json_response = json.loads(context.response.content)
-    logging.debug(context.response.content)
-    entries = json_response["entry"]
-    bundle = [
-        entry for entry in entries if entry["resource"]["resourceType"] == "Bundle"
-    ][0]["resource"]["entry"][0]["resource"]
+    logging.debug("PFP response body: %s", LogBody(context.response.content))
+    bundle = select_one(context.response, "entry(Bundle)[0].entry[0].resource")
     expected_item_id = context.prescription_item_id
     expected_item_status = context.item_status
     expected_terminal_status = context.terminal_status
 
     assert_that(bundle["identifier"][0]["value"].lower()).is_equal_to(expected_item_id)
     assert_that(bundle["status"]).is_equal_to(expected_terminal_status)
-    assert_that(
-        bundle["extension"][0]["extension"][0]["valueCoding"]["code"]
-    ).is_equal_to(expected_item_status)
+    assert_that(compile_path(ITEM_STATUS_PATH).first(bundle)).is_equal_to(
+        expected_item_status
+    )
+
+
+@then(
+    "the updated line items have a status of {status} with a terminal status of {terminal}"
+)
+def updated_line_items_have_status_with_terminal_status(context, status, terminal):
+    if "sandbox" in context.config.userdata["env"].lower():
+        return
+    pfp_api_steps.i_am_authenticated(context)
+    pfp_api_steps.i_request_my_prescriptions(context)
+    medication_requests = {
+        medication_request["identifier"][0]["value"].lower(): medication_request
+        for medication_request in select(
+            context.response, "entry(Bundle)[0].entry[*].resource"
+        )
+    }
+    for item_number in context.updated_item_numbers:
+        item_id = context.prescription_item_ids[item_number - 1]
+        medication_request = medication_requests[str(item_id).lower()]
+        assert_that(medication_request["status"]).is_equal_to(terminal)
+        assert_that(
+            compile_path(ITEM_STATUS_PATH).first(medication_request)
+        ).is_equal_to(status)
@@ -0,0 +1,101 @@
+import copy
+
+from methods.shared.json_backend import dumps, loads
+
+
+class MessageDocument:
+    # A FHIR message shared by the lifecycle steps. It is kept as whichever of
+    # the parsed resource and the serialised body it was made from, converted
+    # to the other only when that is needed, and the serialised body is kept
+    # until the resource is changed through edit().
+    # entry_last says the body ends with the Bundle's entry list, so an entry
+    # can be added to the end of the body without parsing it.
+    def __init__(self, resource=None, body=None, entry_last=False) -> None:
+        self._resource = resource
+        self._body = body
+        self._encoded = None
+        self.entry_last = entry_last
+
+    @classmethod
+    def from_body(cls, body, entry_last=False):
+        return cls(body=body, entry_last=entry_last)
+
+    @property
+    def resource(self):
+        # read-only access, use edit() to change the message
+        if self._resource is None:
+            self._resource = loads(self._body)  # pyright: ignore
+        return self._resource
+
+    @property
+    def body(self):
+        if self._body is None:
+            self._body = dumps(self._resource)
+        return self._body
+
+    @property
+    def encoded(self):
+        # what is sent, so the body is only encoded once however often it is sent
+        if self._encoded is None:
+            self._encoded = self.body.encode("utf-8")
+        return self._encoded
+
+    def edit(self):
+        # The resource to change in place; the serialised body is dropped and
+        # made again the next time it is needed
+        resource = self.resource
+        self._body = None
+        self._encoded = None
+        self.entry_last = False
+        return resource
+
+    def copy(self, parse=False):
+        # Shares whatever this document already has, so nothing is serialised,
+        # and nothing is parsed unless parse is set. The body parsed for that
+        # is kept here, so later copies share it too. The copy gets its own
+        # top-level dict and entry list, but shares everything in them: replace
+        # a value or an entry to change it, as edit_entries() does, rather than
+        # changing it in place.
+        if parse:
+            self.resource
+        document = MessageDocument(body=self._body, entry_last=self.entry_last)
+        document._encoded = self._encoded
+        if self._resource is not None:
+            document._resource = {
+                **self._resource,
+                "entry": list(self._resource["entry"]),
+            }
+        return document
+
+    def append_entry(self, entry):
+        if self._body is None or not self.entry_last:
+            self.edit()["entry"].append(entry)
+            return
+        # the body ends "]}", closing the entry list and the Bundle
+        head = self._body[:-2]
+        separator = "" if head.rstrip().endswith("[") else ","
+        spliced = f"{separator}{dumps(entry)}]}}"
+        self._body = head + spliced
+        if self._encoded is not None:
+            self._encoded = self._encoded[:-2] + spliced.encode("utf-8")
+        if self._resource is not None:
+            # the copy's own entry list, so the documents it shares with don't change
+            self._resource["entry"].append(entry)
+
+    def entries(self, resource_type):
+        return [
+            entry
+            for entry in self.resource["entry"]
+            if entry["resource"]["resourceType"] == resource_type
+        ]
+
+    def edit_entries(self, resource_type):
+        # The entries of a resourceType, each replaced by its own copy so it
+        # can be changed without changing the documents it was copied from
+        resource = self.edit()
+        edited = []
+        for index, entry in enumerate(resource["entry"]):
+            if entry["resource"]["resourceType"] == resource_type:
+                resource["entry"][index] = copy.deepcopy(entry)
+                edited.append(resource["entry"][index])
+        return edited
@@ -1,13 +1,18 @@
-import json
 from typing import Any
 from uuid import uuid4
 
+from messages.eps_fhir.medications import item_indexes
+
 
 class Cancel:
-    def __init__(self, context: Any) -> None:
+    def __init__(self, context: Any, item_numbers=None) -> None:
+        # item_numbers are the 1-based line items to cancel, by default all of them
         self.context = context
-        body = self.create_cancel_body()
-        self.body = self.replace_ids(body)
+        self.item_ids = [
+            context.prescription_item_ids[item_index]
+            for item_index in item_indexes(context, item_numbers)
+        ]
+        self.document = self.create_cancel_document()
 
     def cancel_medication_request(self, medication_request):
         medication_request["resource"]["status"] = "cancelled"
@@ -21,27 +26,30 @@ class Cancel:
             ]
         }
 
-    def create_cancel_body(self):
-        cancel_body = json.loads(self.context.prepare_body)
-
-        medication_requests = [
-            e
-            for e in cancel_body["entry"]
-            if e["resource"]["resourceType"] == "MedicationRequest"
+    def create_cancel_document(self):
+        # The prepared body is parsed once and kept on the prepared document,
+        # which the cancel shares copy on write: the entries and values that
+        # change are replaced rather than changed in place
+        document = self.context.prescription_document.copy(parse=True)
+        cancel_body = document.edit()
+
+        # only the line items being cancelled are sent
+        cancel_body["entry"] = [
+            entry
+            for entry in cancel_body["entry"]
+            if entry["resource"]["resourceType"] != "MedicationRequest"
+            or entry["resource"]["identifier"][0]["value"] in self.item_ids
         ]
+        medication_requests = document.edit_entries("MedicationRequest")
         [self.cancel_medication_request(mr) for mr in medication_requests]
 
-        message_header = [
-            e
-            for e in cancel_body["entry"]
-            if e["resource"]["resourceType"] == "MessageHeader"
-        ][0]
+        message_header = document.edit_entries("MessageHeader")[0]
         event_coding = message_header["resource"]["eventCoding"]
         event_coding["code"] = "prescription-order-update"
         event_coding["display"] = "Prescription Order Update"
 
-        return json.dumps(cancel_body)
-
-    def replace_ids(self, body: str):
-        old_id = json.loads(body)["id"]
-        return body.replace(old_id, str(uuid4()))
+        # the bundle id is also its identifier
+        bundle_id = str(uuid4())
+        cancel_body["id"] = bundle_id
+        cancel_body["identifier"] = {**cancel_body["identifier"], "value": bundle_id}
+        return document
@@ -14,7 +14,13 @@ def create_task(
     status_reason,
     code,
     status,
+    identifier_id=None,
+    authored_on=None,
 ):
+    if identifier_id is None:
+        identifier_id = uuid4()
+    if authored_on is None:
+        authored_on = datetime.now(UTC).isoformat()
     return {
         "resourceType": "Task",
         "id": str(task_id),
@@ -82,7 +88,7 @@ def create_task(
         "identifier": [
             {
                 "system": "https://tools.ietf.org/html/rfc4122",
-                "value": str(uuid4()),
+                "value": str(identifier_id),
             }
         ],
         "status": status,
@@ -105,7 +111,7 @@ def create_task(
                 "value": nhs_number,
             }
         },
-        "authoredOn": datetime.now(UTC).isoformat(),
+        "authoredOn": authored_on,
         "requester": {"reference": f"#urn:uuid:{practitioner_role_id}"},
         "reasonCode": {
             "coding": [
@@ -130,7 +136,13 @@ def create_withdraw_task(
     status_reason,
     code,
     status,
+    identifier_id=None,
+    authored_on=None,
 ):
+    if identifier_id is None:
+        identifier_id = uuid4()
+    if authored_on is None:
+        authored_on = datetime.now(UTC).isoformat()
     return {
         "resourceType": "Task",
         "id": str(task_id),
@@ -210,7 +222,7 @@ def create_withdraw_task(
         "identifier": [
             {
                 "system": "https://tools.ietf.org/html/rfc4122",
-                "value": str(uuid4()),
+                "value": str(identifier_id),
             }
         ],
         "status": status,
@@ -233,7 +245,7 @@ def create_withdraw_task(
                 "value": nhs_number,
             }
         },
-        "authoredOn": datetime.now(UTC).isoformat(),
+        "authoredOn": authored_on,
         "requester": {"reference": f"#{practitioner_role_id}"},
         "reasonCode": {
             "coding": [
@@ -258,7 +270,13 @@ def create_return_task(
     status_reason,
     code,
     status,
+    identifier_id=None,
+    authored_on=None,
 ):
+    if identifier_id is None:
+        identifier_id = uuid4()
+    if authored_on is None:
+        authored_on = datetime.now(UTC).isoformat()
     return {
         "resourceType": "Task",
         "id": str(task_id),
@@ -338,7 +356,7 @@ def create_return_task(
         "identifier": [
             {
                 "system": "https://tools.ietf.org/html/rfc4122",
-                "value": str(uuid4()),
+                "value": str(identifier_id),
             }
         ],
         "status": status,
@@ -361,7 +379,7 @@ def create_return_task(
                 "value": nhs_number,
             }
         },
-        "authoredOn": datetime.now(UTC).isoformat(),
+        "authoredOn": authored_on,
         "requester": {"reference": f"#{practitioner_role_id}"},
         "reasonCode": {
             "coding": [
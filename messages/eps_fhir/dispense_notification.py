@@ -1,15 +1,34 @@
 from datetime import date, datetime, UTC, timedelta
-import json
 from typing import Any
 from uuid import uuid4
 
+from messages.eps_fhir.medications import item_indexes, medication_for_item
+from messages.template import TemplatedMessage
+
 
 class DispenseNotificationValues:
-    def __init__(self, context: Any, amend: bool) -> None:
+    def __init__(self, context: Any, amend: bool, item_numbers=None) -> None:
+        # The 0-based positions on the prescription of the items dispensed. An
+        # amendment is about the same items as the notification it replaces.
+        if amend and item_numbers is None:
+            self.item_indexes = context.dispense_item_indexes
+        else:
+            self.item_indexes = item_indexes(context, item_numbers)
+        context.dispense_item_indexes = self.item_indexes
+
         self.practitioner_role_id = uuid4()
         self.organization_id = uuid4()
-        self.medication_request_id = uuid4()
+        self.medication_request_ids = [uuid4() for _ in self.item_indexes]
+        self.subject_id = uuid4()
+        self.medication_dispense_ids = [uuid4() for _ in self.item_indexes]
+        self.message_header_id = uuid4()
+        self.response_id = str(uuid4())
+        self.authored_on = datetime.now(UTC).isoformat()
+        self.when_handed_over = datetime.now(UTC).isoformat()
+        self.validity_start = str(date.today())
+        self.validity_end = str(date.today() + timedelta(days=1))
 
+        self.amend = amend
         self.medication_dispense_code = "0001"
         self.medication_dispense_display = "Item Fully Dispensed"
         if amend:
@@ -20,7 +39,10 @@ class DispenseNotificationValues:
         self.dispense_notification_id = str(uuid4())
         context.dispense_notification_id = self.dispense_notification_id
 
-        self.prescription_item_id = context.prescription_item_id
+        self.prescription_item_ids = [
+            context.prescription_item_ids[item_index]
+            for item_index in self.item_indexes
+        ]
         self.long_prescription_id = context.long_prescription_id
         self.prescription_id = context.prescription_id
 
@@ -28,27 +50,35 @@ class DispenseNotificationValues:
         self.receiver_ods_code = context.receiver_ods_code
 
 
-class DispenseNotification:
-    def __init__(self, context: Any, amend: bool) -> None:
+class DispenseNotification(TemplatedMessage):
+    shape = ("amend", "item_indexes")
+
+    def __init__(self, context: Any, amend: bool, item_numbers=None) -> None:
+        # item_numbers are the 1-based line items dispensed, by default all of them
         self.HTTP_SNOMED_INFO_SCT = "http://snomed.info/sct"
-        self.values = DispenseNotificationValues(context, amend)
+        self.values = DispenseNotificationValues(context, amend, item_numbers)
+        self.body = self.render()
+
+    def create_message(self):
         practitioner_role = self.practitioner_role()
-        medication_request = self.medication_request()
-        medication_dispense = self.medication_dispense(
-            practitioner_role, medication_request
-        )
+        # one MedicationDispense for each item dispensed, by its position in
+        # the notification
+        medication_dispenses = [
+            self.medication_dispense(
+                position, practitioner_role, self.medication_request(position)
+            )
+            for position in range(len(self.values.item_indexes))
+        ]
         message_header = self.message_header()
-        if amend:
+        if self.values.amend:
             message_header["resource"]["extension"] = self.replacement_extension()
 
         organization = self.organization()
 
-        dispense_notification = self.dispense_notification(
-            message_header, medication_dispense, organization
+        return self.dispense_notification(
+            message_header, *medication_dispenses, organization
         )
 
-        self.body = json.dumps(dispense_notification)
-
     def practitioner_role(self):
         return {
             "resourceType": "PractitionerRole",
@@ -81,10 +111,11 @@ class DispenseNotification:
             "telecom": [{"system": "phone", "use": "work", "value": "02380798431"}],
         }
 
-    def medication_request(self):
+    def medication_request(self, position):
+        medication = medication_for_item(self.values.item_indexes[position])
         return {
             "resourceType": "MedicationRequest",
-            "id": f"{self.values.medication_request_id}",
+            "id": f"{self.values.medication_request_ids[position]}",
             "extension": [
                 {
                     "url": "https://fhir.nhs.uk/StructureDefinition/Extension-DM-PrescriptionType",
@@ -98,7 +129,7 @@ class DispenseNotification:
             "identifier": [
                 {
                     "system": "https://fhir.nhs.uk/Id/prescription-order-item-number",
-                    "value": self.values.prescription_item_id,
+                    "value": self.values.prescription_item_ids[position],
                 }
             ],
             "status": "active",
@@ -118,12 +149,12 @@ class DispenseNotification:
                 "coding": [
                     {
                         "system": self.HTTP_SNOMED_INFO_SCT,  # http only
-                        "code": "322237000",
+                        "code": medication["code"],
                     }
                 ]
             },
-            "subject": {"reference": f"urn:uuid:{uuid4()}"},
-            "authoredOn": datetime.now(UTC).isoformat(),
+            "subject": {"reference": f"urn:uuid:{self.values.subject_id}"},
+            "authoredOn": self.values.authored_on,
             "requester": {"reference": f"urn:uuid:{self.values.practitioner_role_id}"},
             "groupIdentifier": {
                 "extension": [
@@ -149,9 +180,13 @@ class DispenseNotification:
             },
             "dosageInstruction": [
                 {
-                    "text": "4 times a day - Oral",
+                    "text": medication["dosage"],
                     "timing": {
-                        "repeat": {"frequency": 4, "period": 1, "periodUnit": "d"}
+                        "repeat": {
+                            "frequency": medication["frequency"],
+                            "period": 1,
+                            "periodUnit": "d",
+                        }
                     },
                     "route": {
                         "coding": [
@@ -166,8 +201,8 @@ class DispenseNotification:
             ],
             "dispenseRequest": {
                 "validityPeriod": {
-                    "start": str(date.today()),
-                    "end": str(date.today() + timedelta(days=1)),
+                    "start": self.values.validity_start,
+                    "end": self.values.validity_end,
                 },
                 "expectedSupplyDuration": {
                     "value": 30,
@@ -176,25 +211,26 @@ class DispenseNotification:
                     "code": "d",
                 },
                 "quantity": {
-                    "value": 100,
-                    "unit": "tablet",
+                    "value": medication["quantity"],
+                    "unit": medication["unit"],
                     "system": "https://snomed.info/sct",
-                    "code": "428673006",
+                    "code": medication["unit_code"],
                 },
             },
             "substitution": {"allowedBoolean": False},
         }
 
-    def medication_dispense(self, practitioner_role, medication_request):
+    def medication_dispense(self, position, practitioner_role, medication_request):
+        medication = medication_for_item(self.values.item_indexes[position])
         return {
-            "fullUrl": f"urn:uuid:{uuid4()}",
+            "fullUrl": f"urn:uuid:{self.values.medication_dispense_ids[position]}",
             "resource": {
                 "resourceType": "MedicationDispense",
                 "medicationCodeableConcept": {
                     "coding": [
                         {
                             "system": self.HTTP_SNOMED_INFO_SCT,
-                            "code": "322237000",
+                            "code": medication["code"],
                         }
                     ]
                 },
@@ -221,7 +257,7 @@ class DispenseNotification:
                     {"actor": {"reference": f"#{self.values.practitioner_role_id}"}}
                 ],
                 "authorizingPrescription": [
-                    {"reference": f"#{self.values.medication_request_id}"}
+                    {"reference": f"#{self.values.medication_request_ids[position]}"}
                 ],
                 "quantity": {
                     "value": 1,
@@ -233,7 +269,7 @@ class DispenseNotification:
                 "identifier": [
                     {
                         "system": "https://fhir.nhs.uk/Id/prescription-dispense-item-number",
-                        "value": self.values.prescription_item_id,
+                        "value": self.values.prescription_item_ids[position],
                     }
                 ],
                 "type": {
@@ -245,14 +281,14 @@ class DispenseNotification:
                         }
                     ]
                 },
-                "dosageInstruction": [{"text": "4 times a day - Oral"}],
-                "whenHandedOver": datetime.now(UTC).isoformat(),
+                "dosageInstruction": [{"text": medication["dosage"]}],
+                "whenHandedOver": self.values.when_handed_over,
             },
         }
 
     def message_header(self):
         return {
-            "fullUrl": f"urn:uuid:{uuid4()}",
+            "fullUrl": f"urn:uuid:{self.values.message_header_id}",
             "resource": {
                 "resourceType": "MessageHeader",
                 "eventCoding": {
@@ -264,7 +300,7 @@ class DispenseNotification:
                     "endpoint": f"urn:nhs-uk:addressing:ods:{self.values.receiver_ods_code}"
                 },
                 "response": {
-                    "identifier": str(uuid4()),
+                    "identifier": self.values.response_id,
                     "code": "ok",
                 },
             },
@@ -0,0 +1,62 @@
+# EPS accepts at most this many MedicationRequests (line items) in a prescription
+MAX_LINE_ITEMS = 4
+
+# The medication prescribed on each line item, in order, so a prescription with
+# more items has a mix of medications, doses and pack units like a real one
+MEDICATIONS = (
+    # Paracetamol 500mg tablets
+    {
+        "code": "322237000",
+        "dosage": "4 times a day - Oral",
+        "frequency": 4,
+        "quantity": 100,
+        "unit": "tablet",
+        "unit_code": "428673006",
+    },
+    # Amoxicillin 250mg capsules
+    {
+        "code": "39732311000001104",
+        "dosage": "3 times a day - Oral",
+        "frequency": 3,
+        "quantity": 21,
+        "unit": "capsule",
+        "unit_code": "428641000",
+    },
+    # Co-codamol 8mg/500mg tablets
+    {
+        "code": "322341003",
+        "dosage": "2 times a day - Oral",
+        "frequency": 2,
+        "quantity": 60,
+        "unit": "tablet",
+        "unit_code": "428673006",
+    },
+    # Diazepam 2mg tablets
+    {
+        "code": "321196004",
+        "dosage": "Once a day - Oral",
+        "frequency": 1,
+        "quantity": 28,
+        "unit": "tablet",
+        "unit_code": "428673006",
+    },
+)
+
+
+def medication_for_item(item_index):
+    return MEDICATIONS[item_index % len(MEDICATIONS)]
+
+
+def item_indexes(context, item_numbers=None):
+    # The 0-based positions of the line items a message is about: the 1-based
+    # item numbers given, or else every item on the prescription
+    item_ids = context.prescription_item_ids
+    if item_numbers is None:
+        return tuple(range(len(item_ids)))
+    for item_number in item_numbers:
+        if not 1 <= item_number <= len(item_ids):
+            raise ValueError(
+                f"Line item {item_number} is not on a prescription with"
+                f" {len(item_ids)} line items"
+            )
+    return tuple(item_number - 1 for item_number in item_numbers)
@@ -1,25 +1,53 @@
-import json
 from typing import Any
 from uuid import uuid4
 import datetime
 
 from features.environment import CIS2_USERS
+from messages.eps_fhir.medications import MAX_LINE_ITEMS, medication_for_item
+from messages.template import TemplatedMessage
 from utils.prescription_id_generator import generate_short_form_id
 
+# the prescribing organisation on every prescription
+SENDER_ODS_CODE = "A83008"
+# the dispensing site preferences the messages can be built with: P1 is
+# nominated to the receiving pharmacy, 0004 isn't nominated and 0009 is sent
+# without a dispensing site preference
+NOMINATION_CODES = ("P1", "0004", "0009")
+
 
 class PrescriptionValues:
     def __init__(self, context: Any) -> None:
-        self.sender_ods_code = "A83008"
+        self.sender_ods_code = SENDER_ODS_CODE
         context.sender_ods_code = self.sender_ods_code
         self.receiver_ods_code = "FA565"
         context.receiver_ods_code = self.receiver_ods_code
 
         self.long_prescription_id = str(uuid4())
         context.long_prescription_id = self.long_prescription_id
-        self.prescription_id = generate_short_form_id(context.sender_ods_code)
+        # bulk generation and load mode hand out ids from a ShortFormIdGenerator
+        short_form_ids = getattr(context, "short_form_ids", None)
+        self.prescription_id = (
+            next(short_form_ids)
+            if short_form_ids is not None
+            else generate_short_form_id(context.sender_ods_code)
+        )
         context.prescription_id = self.prescription_id
-        self.prescription_item_id = str(uuid4())
+
+        self.line_item_count = getattr(context, "line_item_count", 1)
+        if not 1 <= self.line_item_count <= MAX_LINE_ITEMS:
+            raise ValueError(
+                f"A prescription has 1 to {MAX_LINE_ITEMS} line items,"
+                f" not {self.line_item_count}"
+            )
+        self.prescription_item_ids = [str(uuid4()) for _ in range(self.line_item_count)]
+        context.prescription_item_ids = self.prescription_item_ids
+        # the first item, for the steps that are about a single item
+        self.prescription_item_id = self.prescription_item_ids[0]
         context.prescription_item_id = self.prescription_item_id
+        self.medication_request_ids = ["a54219b8-f741-4c47-b662-e4f8dfa49ab6"] + [
+            str(uuid4()) for _ in range(self.line_item_count - 1)
+        ]
+        context.medication_request_ids = self.medication_request_ids
 
         self.nomination_code = context.nomination_code
         self.nhs_number = context.nhs_number
@@ -27,23 +55,39 @@ class PrescriptionValues:
         self.user_id = CIS2_USERS["prescriber"]["user_id"]
         self.sds_role_id = CIS2_USERS["prescriber"]["role_id"]
 
+        self.bundle_id = str(uuid4())
+        self.message_header_id = str(uuid4())
+        today = datetime.datetime.now()
+        yesterday = today - datetime.timedelta(days=1)
+        future_time = today + datetime.timedelta(days=90)
+        self.validity_start = yesterday.strftime("%Y-%m-%d")
+        self.validity_end = future_time.strftime("%Y-%m-%d")
+
+
+class Prescription(TemplatedMessage):
+    shape = ("nomination_code", "receiver_ods_code", "line_item_count")
 
-class Prescription:
     def __init__(self, context: Any) -> None:
         self.values = PrescriptionValues(context)
         self.HTTPS_ODS_ORGANIZATION_CODE = (
             "https://fhir.nhs.uk/Id/ods-organization-code"
         )
+        self.body = self.render()
+
+    def create_message(self):
         message_header = self.create_message_header()
-        medication_request = self.create_medication_request()
+        medication_requests = [
+            self.create_medication_request(item_index)
+            for item_index in range(self.values.line_item_count)
+        ]
         patient = self.create_patient()
         organization = self.create_organization()
         practitioner_role = self.create_practitioner_role()
         practitioner = self.create_practitioner()
 
-        self.body = self.create_fhir_bundle(
+        return self.create_fhir_bundle(
             message_header,
-            medication_request,
+            *medication_requests,
             patient,
             organization,
             practitioner_role,
@@ -51,7 +95,7 @@ class Prescription:
         )
 
     def create_fhir_bundle(self, *entries):
-        resource_id = str(uuid4())
+        resource_id = self.values.bundle_id
         fhir_resource = {
             "resourceType": "Bundle",
             "id": resource_id,
@@ -60,15 +104,15 @@ class Prescription:
                 "value": resource_id,
             },
             "type": "message",
+            # last, so signing can add the Provenance to the end of the body
             "entry": [],
         }
         fhir_resource["entry"].extend(entries)
-        return json.dumps(fhir_resource)
+        return fhir_resource
 
     def create_message_header(self):
-        bundle_id = uuid4()
         message_header = {
-            "fullUrl": f"urn:uuid:{bundle_id}",
+            "fullUrl": f"urn:uuid:{self.values.message_header_id}",
             "resource": {
                 "resourceType": "MessageHeader",
                 "id": "3599c0e9-9292-413e-9270-9a1ef1ead99c",
@@ -107,13 +151,11 @@ class Prescription:
             )
         return message_header
 
-    def create_medication_request(self):
-        today = datetime.datetime.now()
-        yesterday = today - datetime.timedelta(days=1)
-        future_time = today + datetime.timedelta(days=90)
-
+    def create_medication_request(self, item_index):
+        medication = medication_for_item(item_index)
+        medication_request_id = self.values.medication_request_ids[item_index]
         medication_request = {
-            "fullUrl": "urn:uuid:a54219b8-f741-4c47-b662-e4f8dfa49ab6",
+            "fullUrl": f"urn:uuid:{medication_request_id}",
             "resource": {
                 "resourceType": "MedicationRequest",
                 "extension": [
@@ -129,7 +171,7 @@ class Prescription:
                 "identifier": [
                     {
                         "system": "https://fhir.nhs.uk/Id/prescription-order-item-number",
-                        "value": self.values.prescription_item_id,
+                        "value": self.values.prescription_item_ids[item_index],
                     }
                 ],
                 "status": "active",
@@ -148,7 +190,7 @@ class Prescription:
                     "coding": [
                         {
                             "system": "http://snomed.info/sct",  # http only
-                            "code": "322237000",
+                            "code": medication["code"],
                         }
                     ]
                 },
@@ -182,9 +224,13 @@ class Prescription:
                 },
                 "dosageInstruction": [
                     {
-                        "text": "4 times a day - Oral",
+                        "text": medication["dosage"],
                         "timing": {
-                            "repeat": {"frequency": 4, "period": 1, "periodUnit": "d"}
+                            "repeat": {
+                                "frequency": medication["frequency"],
+                                "period": 1,
+                                "periodUnit": "d",
+                            }
                         },
                         "route": {
                             "coding": [
@@ -199,8 +245,8 @@ class Prescription:
                 ],
                 "dispenseRequest": {
                     "validityPeriod": {
-                        "start": yesterday.strftime("%Y-%m-%d"),
-                        "end": future_time.strftime("%Y-%m-%d"),
+                        "start": self.values.validity_start,
+                        "end": self.values.validity_end,
                     },
                     "expectedSupplyDuration": {
                         "value": 30,
@@ -209,10 +255,10 @@ class Prescription:
                         "code": "d",
                     },
                     "quantity": {
-                        "value": 100,
-                        "unit": "tablet",
+                        "value": medication["quantity"],
+                        "unit": medication["unit"],
                         "system": "https://snomed.info/sct",
-                        "code": "428673006",
+                        "code": medication["unit_code"],
                     },
                 },
                 "substitution": {"allowedBoolean": False},
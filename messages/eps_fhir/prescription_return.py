@@ -1,7 +1,8 @@
-import json
+from datetime import UTC, datetime
 from typing import Any
 from uuid import uuid4
 from messages.eps_fhir.common import create_return_task
+from messages.template import TemplatedMessage
 
 
 class ReturnValues:
@@ -9,15 +10,21 @@ class ReturnValues:
         self.practitioner_role_id = uuid4()
         self.organization_id = uuid4()
         self.task_id = uuid4()
+        self.identifier_id = uuid4()
+        self.authored_on = datetime.now(UTC).isoformat()
 
         self.sender_ods_code = context.sender_ods_code
         self.prescription_id = context.prescription_id
         self.nhs_number = context.nhs_number
 
 
-class Return:
+class Return(TemplatedMessage):
     def __init__(self, context: Any) -> None:
-        values = ReturnValues(context)
+        self.values = ReturnValues(context)
+        self.body = self.render()
+
+    def create_message(self):
+        values = self.values
         status_reason = {
             "coding": [
                 {
@@ -37,7 +44,7 @@ class Return:
             ]
         }
 
-        body = create_return_task(
+        return create_return_task(
             values.task_id,
             values.practitioner_role_id,
             values.organization_id,
@@ -48,5 +55,6 @@ class Return:
             status_reason,
             code,
             "rejected",
+            values.identifier_id,
+            values.authored_on,
         )
-        self.body = json.dumps(body)
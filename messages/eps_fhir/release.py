@@ -1,22 +1,26 @@
-import json
 from typing import Any
 from uuid import uuid4
 from features.environment import CIS2_USERS
+from messages.template import TemplatedMessage
 
 
 class ReleaseValues:
     def __init__(self, context: Any) -> None:
         self.prescription_id = context.prescription_id
         self.receiver_ods_code = context.receiver_ods_code
+        self.parameters_id = str(uuid4())
 
 
-class Release:
+class Release(TemplatedMessage):
     def __init__(self, context: Any) -> None:
         self.values = ReleaseValues(context)
+        self.body = self.render()
+
+    def create_message(self):
         group_identifier = self.create_group_identifier()
         owner = self.create_owner()
         agent = self.create_agent()
-        self.body = self.create_fhir_parameter(group_identifier, owner, agent)
+        return self.create_fhir_parameter(group_identifier, owner, agent)
 
     def create_group_identifier(self):
         return {
@@ -100,8 +104,8 @@ class Release:
     def create_fhir_parameter(self, *entries):
         fhir_resource = {
             "resourceType": "Parameters",
-            "id": str(uuid4()),
+            "id": self.values.parameters_id,
             "parameter": [{"name": "status", "valueCode": "accepted"}],
         }
         fhir_resource["parameter"].extend(entries)
-        return json.dumps(fhir_resource)
+        return fhir_resource
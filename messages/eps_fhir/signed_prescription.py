@@ -1,4 +1,3 @@
-import json
 from typing import Any
 
 from utils.signing import get_signature
@@ -8,10 +7,10 @@ class SignedPrescription:
     def __init__(self, context: Any) -> None:
         context.signature = get_signature(context.digest, context.algorithm)
         self.context = context
-        prescription = json.loads(context.prepare_body)
-        provenance = self.generate_provenance()
-        prescription["entry"].append(provenance)
-        self.body = json.dumps(prescription)
+        # the Provenance is added to the end of the prepared body, so the
+        # prescription isn't parsed and serialised again
+        self.document = context.prescription_document.copy()
+        self.document.append_entry(self.generate_provenance())
 
     def generate_provenance(self):
         return {
@@ -19,7 +18,8 @@ class SignedPrescription:
             "resource": {
                 "resourceType": "Provenance",
                 "target": [
-                    {"reference": "urn:uuid:a54219b8-f741-4c47-b662-e4f8dfa49ab6"}
+                    {"reference": f"urn:uuid:{medication_request_id}"}
+                    for medication_request_id in self.context.medication_request_ids
                 ],
                 "recorded": "2008-02-27T11:38:00+00:00",
                 "agent": [
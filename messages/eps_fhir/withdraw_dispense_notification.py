@@ -1,8 +1,9 @@
-import json
+from datetime import UTC, datetime
 from typing import Any
 from uuid import uuid4
 
 from messages.eps_fhir.common import create_withdraw_task
+from messages.template import TemplatedMessage
 
 
 class WithdrawDispenseNotificationValues:
@@ -10,6 +11,8 @@ class WithdrawDispenseNotificationValues:
         self.practitioner_role_id = uuid4()
         self.organization_id = uuid4()
         self.medication_request_id = uuid4()
+        self.identifier_id = uuid4()
+        self.authored_on = datetime.now(UTC).isoformat()
 
         self.dispense_notification_id = context.dispense_notification_id
         self.sender_ods_code = context.sender_ods_code
@@ -18,9 +21,13 @@ class WithdrawDispenseNotificationValues:
         self.nhs_number = context.nhs_number
 
 
-class WithdrawDispenseNotification:
+class WithdrawDispenseNotification(TemplatedMessage):
     def __init__(self, context: Any) -> None:
-        values = WithdrawDispenseNotificationValues(context)
+        self.values = WithdrawDispenseNotificationValues(context)
+        self.body = self.render()
+
+    def create_message(self):
+        values = self.values
         status_reason = {
             "coding": [
                 {
@@ -40,7 +47,7 @@ class WithdrawDispenseNotification:
             ]
         }
 
-        body = create_withdraw_task(
+        return create_withdraw_task(
             values.dispense_notification_id,
             values.practitioner_role_id,
             values.organization_id,
@@ -51,5 +58,6 @@ class WithdrawDispenseNotification:
             status_reason,
             code,
             "in-progress",
+            values.identifier_id,
+            values.authored_on,
         )
-        self.body = json.dumps(body)
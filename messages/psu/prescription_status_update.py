@@ -1,12 +1,17 @@
-import json
 from typing import Any
 from uuid import uuid4
 
+from messages.eps_fhir.medications import item_indexes
+from methods.shared.json_backend import dumps
+
 
 class StatusUpdatesValues:
-    def __init__(self, context: Any) -> None:
+    def __init__(self, context: Any, item_numbers=None) -> None:
         self.prescription_id = context.prescription_id
-        self.prescription_item_id = context.prescription_item_id
+        self.prescription_item_ids = [
+            context.prescription_item_ids[item_index]
+            for item_index in item_indexes(context, item_numbers)
+        ]
         self.terminal_status = context.terminal_status
         self.item_status = context.item_status
         self.receiver_ods_code = context.receiver_ods_code
@@ -14,11 +19,15 @@ class StatusUpdatesValues:
 
 
 class StatusUpdate:
-    def __init__(self, context: Any) -> None:
-        self.values = StatusUpdatesValues(context)
-        task = self.create_task()
+    def __init__(self, context: Any, item_numbers=None) -> None:
+        # item_numbers are the 1-based line items updated, by default all of them
+        self.values = StatusUpdatesValues(context, item_numbers)
+        tasks = [
+            self.create_task(prescription_item_id)
+            for prescription_item_id in self.values.prescription_item_ids
+        ]
 
-        self.body = self.create_fhir_bundle(task)
+        self.body = self.create_fhir_bundle(*tasks)
 
     def create_fhir_bundle(self, *entries):
         fhir_resource = {
@@ -27,9 +36,9 @@ class StatusUpdate:
             "entry": [],
         }
         fhir_resource["entry"].extend(entries)
-        return json.dumps(fhir_resource)
+        return dumps(fhir_resource)
 
-    def create_task(self):
+    def create_task(self, prescription_item_id):
         task_identifier = uuid4()
         task = {
             "fullUrl": f"urn:uuid:{task_identifier}",
@@ -57,7 +66,7 @@ class StatusUpdate:
                 "focus": {
                     "identifier": {
                         "system": "https://fhir.nhs.uk/Id/prescription-order-item-number",
-                        "value": f"{self.values.prescription_item_id}",
+                        "value": f"{prescription_item_id}",
                     }
                 },
                 "for": {
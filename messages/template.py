@@ -0,0 +1,110 @@
+import copy
+import json
+import re
+from json.encoder import encode_basestring_ascii
+from typing import Any
+
+from methods.shared.json_backend import dumps
+
+# A slot is a marker string put in place of a value while the template is built.
+# json.dumps escapes the NUL characters, so a slot can't clash with real content.
+# A slot for an item of a list value is named "name.index".
+SLOT_PATTERN = re.compile(r'"\\u0000([\w.]+)\\u0000"|\\u0000([\w.]+)\\u0000')
+
+# (message class, shape) -> MessageTemplate
+_templates = {}
+
+
+def slot(name):
+    return f"\0{name}\0"
+
+
+class SlotValues:
+    # Stands in for a message's values: the shape attributes keep their real
+    # value as they decide the structure, every other attribute is a slot. A
+    # list becomes a list of slots, so its length has to be set by the shape.
+    def __init__(self, values, shape) -> None:
+        self._values = values
+        for name in shape:
+            setattr(self, name, getattr(values, name))
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        value = getattr(self._values, name)
+        if isinstance(value, (list, tuple)):
+            return [slot(f"{name}.{index}") for index in range(len(value))]
+        return slot(name)
+
+
+def parse_slot(slot_name):
+    # "name" -> ("name", None), "name.2" -> ("name", 2)
+    name, _, index = slot_name.partition(".")
+    return name, int(index) if index else None
+
+
+def encode_value(value):
+    # values are written the way the builders write them, which is str() apart
+    # from JSON scalars
+    if value is None or isinstance(value, (bool, int, float)):
+        return json.dumps(value)
+    return encode_basestring_ascii(str(value))
+
+
+class MessageTemplate:
+    def __init__(self, message) -> None:
+        text = dumps(message)
+        # the literal text either side of each slot, and the slots between them
+        self.literals = []
+        self.slots = []
+        position = 0
+        for match in SLOT_PATTERN.finditer(text):
+            start = match.start()
+            self.literals.append(text[position:start])
+            if match.group(1):
+                # the slot is the whole value
+                self.slots.append((*parse_slot(match.group(1)), True))
+            else:
+                # the slot is part of a string
+                self.slots.append((*parse_slot(match.group(2)), False))
+            position = match.end()
+        self.literals.append(text[position:])
+
+    def render(self, values):
+        parts = [self.literals[0]]
+        for (name, index, whole_value), literal in zip(self.slots, self.literals[1:]):
+            value = getattr(values, name)
+            if index is not None:
+                value = value[index]
+            if whole_value:
+                parts.append(encode_value(value))
+            else:
+                parts.append(encode_basestring_ascii(str(value))[1:-1])
+            parts.append(literal)
+        return "".join(parts)
+
+
+class TemplatedMessage:
+    # Base for message builders whose create_message() reads every value that
+    # changes between messages from self.values. The message is built and
+    # serialised once per shape, and each body is then made by filling in the
+    # slots. Attributes of values named in shape change the structure of the
+    # message, so each combination of them gets its own template.
+    shape = ()
+    # the builder's own values, or SlotValues standing in for them while the
+    # template is built
+    values: Any
+
+    def create_message(self) -> dict:
+        raise NotImplementedError
+
+    def render(self):
+        key = (type(self), tuple(getattr(self.values, name) for name in self.shape))
+        template = _templates.get(key)
+        if template is None:
+            builder = copy.copy(self)
+            builder.values = SlotValues(self.values, self.shape)
+            template = _templates.setdefault(
+                key, MessageTemplate(builder.create_message())
+            )
+        return template.render(self.values)
@@ -1,23 +1,120 @@
+import os
+import threading
+import time
 import uuid
-from requests import get as api_get_request
-from requests import post as api_post_request
-from methods.shared import common
+from urllib.parse import urlsplit
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from methods.shared import common, latency, response_schemas
+from methods.shared.logs import LogBody
 import logging
 
+# Maximum number of kept-alive connections to each host
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+# Connection pools are thread-safe and shared by every thread, whereas sessions
+# (and their cookies) are kept per thread
+_adapters = {}
+_adapters_lock = threading.Lock()
+_thread_local = threading.local()
+logger = logging.getLogger(__name__)
+
+
+def _get_adapter(base_url):
+    with _adapters_lock:
+        if base_url not in _adapters:
+            _adapters[base_url] = HTTPAdapter(
+                pool_connections=1, pool_maxsize=HTTP_POOL_SIZE
+            )
+        return _adapters[base_url]
+
+
+def get_session(url):
+    parts = urlsplit(url)
+    base_url = f"{parts.scheme}://{parts.netloc}/"
+    sessions = getattr(_thread_local, "sessions", None)
+    if sessions is None:
+        sessions = _thread_local.sessions = {}
+    if base_url not in sessions:
+        session = Session()
+        session.mount(base_url, _get_adapter(base_url))
+        sessions[base_url] = session
+    return sessions[base_url]
+
+
+def close_sessions():
+    for session in getattr(_thread_local, "sessions", {}).values():
+        session.close()
+    _thread_local.sessions = {}
+    with _adapters_lock:
+        for adapter in _adapters.values():
+            adapter.close()
+        _adapters.clear()
+
+
+def send(context, method, **kwargs):
+    endpoint = latency.endpoint_name(method, kwargs["url"])
+    # e.g. "3 line items", so latency can be compared across prescription sizes
+    latency_group = getattr(context, "latency_group", None)
+    if latency_group:
+        endpoint = f"{endpoint} [{latency_group}]"
+    started = time.perf_counter()
+    response = get_session(kwargs["url"]).request(method, **kwargs)
+    elapsed = time.perf_counter() - started
+    latency.record(endpoint, elapsed)
+    # kept on the context so the scenario's own timings can be attached to it
+    api_latency = getattr(context, "api_latency", None)
+    if api_latency is None:
+        api_latency = context.api_latency = {}
+    api_latency.setdefault(endpoint, []).append(round(elapsed * 1000, 3))
+    return response
+
+
+def check_response_schema(method, url, response):
+    # Checked after the response is on the context and attached, so a response
+    # that doesn't match its schema is still in the report
+    if response_schemas.VALIDATE_RESPONSES:
+        response_schemas.check_response(latency.endpoint_name(method, url), response)
+
+
+def log_request(method, url, data):
+    # Formatted only if DEBUG records are written, and bodies are cut short
+    logger.debug(
+        "%s %s request body: %s",
+        method,
+        url,
+        LogBody(data),
+        extra={"http_method": method, "url": url},
+    )
+
+
+def log_response(method, url, response):
+    logger.debug(
+        "%s %s response %s body: %s",
+        method,
+        url,
+        response.status_code,
+        LogBody(response.content),
+        extra={"http_method": method, "url": url, "status_code": response.status_code},
+    )
+
 
 def get(context, **kwargs):
-    logging.debug(f"Request Body: {kwargs.get("data")}")
-    context.response = api_get_request(**kwargs)
-    logging.debug(f"Response Body: {context.response}")
+    log_request("GET", kwargs["url"], kwargs.get("data"))
+    context.response = send(context, "GET", **kwargs)
+    log_response("GET", kwargs["url"], context.response)
     common.attach_api_information(context)
+    check_response_schema("GET", kwargs["url"], context.response)
     return context.response
 
 
 def post(context, **kwargs):
-    logging.debug(f"Request Body: {kwargs.get("data")}")
-    context.response = api_post_request(**kwargs)
-    logging.debug(f"Response Body: {context.response.content}")
+    log_request("POST", kwargs["url"], kwargs.get("data"))
+    context.response = send(context, "POST", **kwargs)
+    log_response("POST", kwargs["url"], context.response)
     common.attach_api_information(context)
+    check_response_schema("POST", kwargs["url"], context.response)
     return context.response
 
 
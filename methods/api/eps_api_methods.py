@@ -1,4 +1,5 @@
 from features.environment import CIS2_USERS
+from messages.document import MessageDocument
 from messages.eps_fhir.cancel import Cancel
 from messages.eps_fhir.dispense_notification import DispenseNotification
 from messages.eps_fhir.prescription import Prescription
@@ -10,6 +11,7 @@ from messages.eps_fhir.withdraw_dispense_notification import (
 )
 from methods.api.common_api_methods import get_headers, post
 from methods.shared.common import the_expected_response_code_is_returned
+from methods.shared.json_backend import response_json
 
 PRESCRIBING_BASE_URL = ""
 DISPENSING_BASE_URL = ""
@@ -32,23 +34,32 @@ def prepare_prescription(context):
     additional_headers = {"Content-Type": "application/json"}
     headers = get_headers(context, additional_headers)
 
-    context.prepare_body = Prescription(context).body
+    # shared with the later steps, which copy it rather than parsing it again
+    context.prescription_document = MessageDocument.from_body(
+        Prescription(context).body, entry_last=True
+    )
     response = post(
-        data=context.prepare_body, url=url, context=context, headers=headers
+        data=context.prescription_document.encoded,
+        url=url,
+        context=context,
+        headers=headers,
     )
     the_expected_response_code_is_returned(context, 200)
 
-    context.digest = response.json()["parameter"][0]["valueString"]
-    context.timestamp = response.json()["parameter"][1]["valueString"]
-    context.algorithm = response.json()["parameter"][2]["valueString"]
+    parameters = response_json(response)["parameter"]
+    context.digest = parameters[0]["valueString"]
+    context.timestamp = parameters[1]["valueString"]
+    context.algorithm = parameters[2]["valueString"]
 
 
 def create_signed_prescription(context):
     url = f"{PRESCRIBING_BASE_URL}/FHIR/R4/$process-message#prescription-order"
     headers = get_headers(context)
 
-    context.signed_body = SignedPrescription(context).body
-    post(data=context.signed_body, url=url, context=context, headers=headers)
+    context.signed_document = SignedPrescription(context).document
+    post(
+        data=context.signed_document.encoded, url=url, context=context, headers=headers
+    )
     the_expected_response_code_is_returned(context, 200)
 
 
@@ -62,20 +73,26 @@ def release_signed_prescription(context):
 
 
 def cancel_all_line_items(context):
+    cancel_line_items(context)
+
+
+def cancel_line_items(context, item_numbers=None):
     url = f"{PRESCRIBING_BASE_URL}/FHIR/R4/$process-message"
     additional_headers = {"NHSD-Session-URID": CIS2_USERS["prescriber"]["role_id"]}
     headers = get_headers(context, additional_headers)
 
-    context.cancel_body = Cancel(context).body
-    post(data=context.cancel_body, url=url, context=context, headers=headers)
+    context.cancel_document = Cancel(context, item_numbers).document
+    post(
+        data=context.cancel_document.encoded, url=url, context=context, headers=headers
+    )
 
 
-def dispense_prescription(context):
+def dispense_prescription(context, item_numbers=None):
     url = f"{DISPENSING_BASE_URL}/FHIR/R4/$process-message#dispense-notification"
     additional_headers = {"NHSD-Session-URID": CIS2_USERS["dispenser"]["role_id"]}
     headers = get_headers(context, additional_headers)
 
-    dispense_notification = DispenseNotification(context, False).body
+    dispense_notification = DispenseNotification(context, False, item_numbers).body
     post(data=dispense_notification, url=url, context=context, headers=headers)
 
 
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import threading
+import uuid
+
+import allure_commons
+from allure_behave.formatter import AllureFormatter
+from allure_commons.logger import AllureFileLogger
+
+
+def stored_file_name(digest, file_name):
+    # "<sha256 of the content>-attachment.<extension>", so the same content
+    # always gets the same file and is only written once
+    extension = file_name.partition("-attachment")[2]
+    return f"{digest}-attachment{extension}"
+
+
+def executable_items(item):
+    # a result or container and all its steps, fixtures and their steps
+    yield item
+    for child in [
+        *getattr(item, "steps", []),
+        *getattr(item, "befores", []),
+        *getattr(item, "afters", []),
+    ]:
+        yield from executable_items(child)
+
+
+class ContentAddressedFileLogger(AllureFileLogger):
+    # Writes each attachment to a file named after its content instead of
+    # after a new uuid, so identical headers and bodies attached by many steps
+    # are stored once. The results are written referring to those files.
+    def __init__(self, report_dir, clean=False) -> None:
+        super().__init__(report_dir, clean)
+        # the file name allure gave an attachment -> the file it is stored in
+        self.sources = {}
+        self.lock = threading.Lock()
+
+    def store(self, content, file_name):
+        stored_name = stored_file_name(hashlib.sha256(content).hexdigest(), file_name)
+        final_destination = self._report_dir / stored_name
+        with self.lock:
+            self.sources[file_name] = stored_name
+            if final_destination.exists():
+                return
+            # parallel workers share allure-results, so each writes its own
+            # temporary file and the last to finish replaces an identical one
+            tmp_destination = self._report_dir / f"{stored_name}.{uuid.uuid4()}.tmp"
+            with open(tmp_destination, "wb") as attached_file:
+                attached_file.write(content)
+            os.replace(tmp_destination, final_destination)
+
+    def use_stored_sources(self, item):
+        with self.lock:
+            for executable_item in executable_items(item):
+                for attachment in getattr(executable_item, "attachments", []):
+                    attachment.source = self.sources.pop(
+                        attachment.source, attachment.source
+                    )
+
+    @allure_commons.hookimpl
+    def report_attached_data(self, body, file_name):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.store(body, file_name)
+
+    @allure_commons.hookimpl
+    def report_attached_file(self, source, file_name):
+        with open(source, "rb") as source_file:
+            self.store(source_file.read(), file_name)
+
+    @allure_commons.hookimpl
+    def report_result(self, result):
+        self.use_stored_sources(result)
+        super().report_result(result)
+
+    @allure_commons.hookimpl
+    def report_container(self, container):
+        self.use_stored_sources(container)
+        super().report_container(container)
+
+
+class ContentAddressedAllureFormatter(AllureFormatter):
+    # The allure-behave formatter with its file logger swapped for one that
+    # stores attachments by content
+    def __init__(self, stream_opener, config) -> None:
+        super().__init__(stream_opener, config)
+        # allure-behave 2.13 keeps the logger it registers in a local variable,
+        # so it is found among the registered plugins instead
+        for plugin in list(allure_commons.plugin_manager.get_plugins()):
+            if type(plugin) is AllureFileLogger:
+                allure_commons.plugin_manager.unregister(plugin)
+        self.file_logger = ContentAddressedFileLogger(self.stream_opener.name)
+        allure_commons.plugin_manager.register(self.file_logger)
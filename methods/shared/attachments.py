@@ -0,0 +1,63 @@
+import os
+import random
+import threading
+
+import allure
+
+# Which steps' attachments are written to allure-results:
+#   always      every step's
+#   on-failure  only failed steps'
+#   sampled     failed steps' and ATTACHMENT_SAMPLE_RATE of the others
+ATTACHMENT_POLICY = os.getenv("ATTACHMENT_POLICY", "always").lower()
+ATTACHMENT_SAMPLE_RATE = float(os.getenv("ATTACHMENT_SAMPLE_RATE", "0.1"))
+# Longer attachments are cut down to this many characters
+ATTACHMENT_MAX_LENGTH = int(os.getenv("ATTACHMENT_MAX_LENGTH", "65536"))
+if ATTACHMENT_POLICY not in ("always", "on-failure", "sampled"):
+    raise ValueError(
+        f"ATTACHMENT_POLICY must be always, on-failure or sampled,"
+        f" not {ATTACHMENT_POLICY}"
+    )
+
+_thread_local = threading.local()
+
+
+def start_step():
+    _thread_local.pending = []
+
+
+def attach(make_body, name, attachment_type):
+    # make_body is only called if the attachment is written, so nothing is
+    # serialised for steps whose attachments are dropped. Outside a step, as
+    # in load mode, there is nothing to attach to and the attachment is dropped.
+    pending = getattr(_thread_local, "pending", None)
+    if pending is not None:
+        pending.append((make_body, name, attachment_type))
+
+
+def should_write(failed):
+    if failed or ATTACHMENT_POLICY == "always":
+        return True
+    return ATTACHMENT_POLICY == "sampled" and random.random() < ATTACHMENT_SAMPLE_RATE
+
+
+def truncate(body, attachment_type):
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    if len(body) <= ATTACHMENT_MAX_LENGTH:
+        return body, attachment_type
+    # cut short it's no longer valid JSON, so it is attached as text
+    return (
+        f"{body[:ATTACHMENT_MAX_LENGTH]}\n"
+        f"... {len(body) - ATTACHMENT_MAX_LENGTH} more characters not attached",
+        allure.attachment_type.TEXT,
+    )
+
+
+def finish_step(failed):
+    pending = getattr(_thread_local, "pending", None)
+    _thread_local.pending = None
+    if not pending or not should_write(failed):
+        return
+    for make_body, name, attachment_type in pending:
+        body, attachment_type = truncate(make_body(), attachment_type)
+        allure.attach(body, name, attachment_type)
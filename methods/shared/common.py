@@ -1,4 +1,5 @@
 import json
+import time
 import allure
 
 from assertpy import assert_that as assertpy_assert  # type: ignore
@@ -17,6 +18,10 @@ from features.environment import (
     JWT_PRIVATE_KEY,
     JWT_KID,
 )
+from methods.shared import attachments, token_cache
+
+# Used when a token response does not say how long the token lasts
+DEFAULT_TOKEN_LIFETIME_SECONDS = 599
 
 
 def get_psu_authenticator(env, url):
@@ -78,10 +83,20 @@ def get_pfp_apigee_authenticator(env, url):
 
 
 def get_auth(env, product, user="prescriber"):
-    authenticator = None
     if product != "EPS-FHIR" and product != "PFP-APIGEE" and product != "PSU":
         raise ValueError(f"Unknown product {product}")
     env = env.lower()
+    if env == "localhost":
+        # the local stand-ins do not check authorisation
+        return "localhost"
+    return token_cache.get_token(
+        (env, product, user, CLIENT_ID),
+        lambda: authenticate(env, product, user),
+    )
+
+
+def authenticate(env, product, user):
+    authenticator = None
     url = f"https://{env}.api.service.nhs.uk/oauth2-mock"
     if product in ["EPS-FHIR", "EPS-FHIR-DISPENSING", "EPS-FHIR-PRESCRIBING"]:
         authenticator = get_eps_fhir_authenticator(user, env, url)
@@ -90,7 +105,7 @@ def get_auth(env, product, user="prescriber"):
     if product == "PSU":
         authenticator = get_psu_authenticator(env, url)
     if authenticator is not None:
-        return get_token(authenticator)
+        return get_token_with_expiry(authenticator)
     else:
         raise ValueError(
             "Authentication failed because authenticator was not generated"
@@ -98,56 +113,49 @@ def get_auth(env, product, user="prescriber"):
 
 
 def get_token(authenticator):
+    token, _ = get_token_with_expiry(authenticator)
+    return token
+
+
+def get_token_with_expiry(authenticator):
+    requested_at = time.time()
     # 3. Get your token
     token_response = authenticator.get_token()
     assert "access_token" in token_response
     token = token_response["access_token"]
-    return token
+    expires_in = int(token_response.get("expires_in", DEFAULT_TOKEN_LIFETIME_SECONDS))
+    return token, requested_at + expires_in
 
 
 def assert_that(actual):
-    allure.attach(
-        body=str(actual), name="Actual", attachment_type=allure.attachment_type.TEXT
-    )
+    attachments.attach(lambda: str(actual), "Actual", allure.attachment_type.TEXT)
     return assertpy_assert(val=actual)
 
 
+def request_body_text(request):
+    request_body = request.body
+    if isinstance(request_body, bytes):
+        # message documents are sent already encoded
+        request_body = request_body.decode("utf-8")
+    return request_body
+
+
 def attach_api_information(context):
-    allure.attach(
-        json.dumps(dict(context.response.request.headers)),
-        "REQUEST Headers",
-        allure.attachment_type.JSON,
-    )
-    allure.attach(
-        json.dumps(context.response.request.method),
-        "REQUEST Method",
-        allure.attachment_type.JSON,
-    )
-    allure.attach(
-        json.dumps(context.response.request.url),
-        "REQUEST URL",
-        allure.attachment_type.JSON,
-    )
-    allure.attach(
-        json.dumps(context.response.request.body),
-        "REQUEST Body",
-        allure.attachment_type.JSON,
-    )
-    allure.attach(
-        str(context.response.status_code),
-        "RESPONSE Status Code",
-        allure.attachment_type.TEXT,
-    )
-    allure.attach(
-        json.dumps(dict(context.response.headers)),
-        "RESPONSE Headers",
-        allure.attachment_type.JSON,
-    )
-    allure.attach(
-        context.response.content,
-        "RESPONSE Body",
-        allure.attachment_type.JSON,
-    )
+    # Attached when the step finishes, as the attachment policy allows
+    response = context.response
+    request = response.request
+    for make_body, name, attachment_type in (
+        (lambda: json.dumps(dict(request.headers)), "REQUEST Headers", "JSON"),
+        (lambda: json.dumps(request.method), "REQUEST Method", "JSON"),
+        (lambda: json.dumps(request.url), "REQUEST URL", "JSON"),
+        (lambda: json.dumps(request_body_text(request)), "REQUEST Body", "JSON"),
+        (lambda: str(response.status_code), "RESPONSE Status Code", "TEXT"),
+        (lambda: json.dumps(dict(response.headers)), "RESPONSE Headers", "JSON"),
+        (lambda: response.content, "RESPONSE Body", "JSON"),
+    ):
+        attachments.attach(
+            make_body, name, getattr(allure.attachment_type, attachment_type)
+        )
 
 
 def the_expected_response_code_is_returned(context, expected_response_code: int):
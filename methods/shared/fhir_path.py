@@ -0,0 +1,137 @@
+import collections
+import functools
+import re
+
+from methods.shared.json_backend import response_json
+
+# A path is steps separated by dots. Each step is a field name, optionally a
+# resourceType in brackets, then any number of selectors. entry(MedicationRequest)
+# finds the MedicationRequest resources in a Bundle's entries. The selectors are:
+#   [0]          the item at that position
+#   [*]          every item
+#   [name=value] the items with that value at a dotted path of field names
+# For example "entry(Bundle)[0].entry(MedicationRequest).identifier[0].value"
+# Each step is applied to every value the previous one found, so a path finds
+# a list of values.
+STEP_PATTERN = re.compile(
+    r"(?P<name>\w+)(?:\((?P<resource_type>\w+)\))?(?P<selectors>(?:\[[^\]]*\])*)"
+    r"(?:\.|$)"
+)
+SELECTOR_PATTERN = re.compile(r"\[([^\]]*)\]")
+
+
+class EntryIndex:
+    # The entries of each Bundle in a document by resourceType, so finding a
+    # resourceType in a large bundle is a lookup after its entries are first read
+    def __init__(self) -> None:
+        self.bundles = {}
+
+    def resources(self, bundle, resource_type):
+        indexed = self.bundles.get(id(bundle))
+        if indexed is None:
+            by_type = collections.defaultdict(list)
+            for entry in bundle.get("entry", []):
+                resource = entry["resource"]
+                by_type[resource["resourceType"]].append(resource)
+            # the bundle is kept so its id isn't reused while it's in the index
+            indexed = self.bundles[id(bundle)] = (bundle, by_type)
+        return indexed[1].get(resource_type, [])
+
+
+def children(value, name):
+    child = value.get(name) if isinstance(value, dict) else None
+    if child is None:
+        return []
+    return child if isinstance(child, list) else [child]
+
+
+def matches(value, field_path, expected):
+    values = [value]
+    for name in field_path:
+        values = [child for value in values for child in children(value, name)]
+    return any(str(value) == expected for value in values)
+
+
+def compile_selector(selector):
+    if selector == "*":
+        return lambda values: values
+    if selector.isdigit():
+        start = int(selector)
+        end = start + 1
+        return lambda values: values[start:end]
+    field_path, separator, expected = selector.partition("=")
+    if not separator:
+        raise ValueError(f"'{selector}' is not a position, * or name=value")
+    names = field_path.split(".")
+    return lambda values: [value for value in values if matches(value, names, expected)]
+
+
+class FhirPath:
+    def __init__(self, expression) -> None:
+        self.expression = expression
+        self.steps = []
+        position = 0
+        while position < len(expression):
+            step = STEP_PATTERN.match(expression, position)
+            if step is None:
+                raise ValueError(f"Can't read '{expression}' from position {position}")
+            selectors = [
+                compile_selector(selector)
+                for selector in SELECTOR_PATTERN.findall(step["selectors"])
+            ]
+            self.steps.append((step["name"], step["resource_type"], selectors))
+            position = step.end()
+
+    def evaluate(self, document, index=None):
+        index = index or EntryIndex()
+        values = [document]
+        for name, resource_type, selectors in self.steps:
+            found = []
+            for value in values:
+                if resource_type is None:
+                    step_values = children(value, name)
+                elif name == "entry" and isinstance(value, dict):
+                    step_values = index.resources(value, resource_type)
+                else:
+                    step_values = [
+                        child
+                        for child in children(value, name)
+                        if child.get("resourceType") == resource_type
+                    ]
+                for selector in selectors:
+                    step_values = selector(step_values)
+                found.extend(step_values)
+            values = found
+        return values
+
+    def first(self, document, index=None):
+        values = self.evaluate(document, index)
+        if not values:
+            raise ValueError(f"Nothing found at {self.expression}")
+        return values[0]
+
+
+@functools.lru_cache(maxsize=None)
+def compile_path(expression):
+    return FhirPath(expression)
+
+
+def response_index(response):
+    # Kept on the response like its parsed body, so every check of a response
+    # shares one index
+    index = response.__dict__.get("_entry_index")
+    if index is None:
+        index = response._entry_index = EntryIndex()
+    return index
+
+
+def select(response, expression):
+    return compile_path(expression).evaluate(
+        response_json(response), response_index(response)
+    )
+
+
+def select_one(response, expression):
+    return compile_path(expression).first(
+        response_json(response), response_index(response)
+    )
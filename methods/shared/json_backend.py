@@ -0,0 +1,46 @@
+import json
+import os
+
+# orjson is optional; it serialises and parses several times faster than the
+# standard library, which is used when orjson isn't installed
+try:
+    import orjson  # pyright: ignore [reportMissingImports]
+except ImportError:
+    orjson = None
+
+# "orjson" or "json", defaulting to orjson when it is installed
+JSON_BACKEND = os.getenv("JSON_BACKEND", "orjson" if orjson else "json").lower()
+if JSON_BACKEND == "orjson" and orjson is None:
+    raise ImportError("JSON_BACKEND is orjson but orjson is not installed")
+
+
+def dumps_bytes(value):
+    if JSON_BACKEND == "orjson":
+        return orjson.dumps(value)  # pyright: ignore [reportOptionalMemberAccess]
+    return json.dumps(value).encode("utf-8")
+
+
+def dumps(value):
+    if JSON_BACKEND == "orjson":
+        return dumps_bytes(value).decode("utf-8")
+    return json.dumps(value)
+
+
+def loads(data):
+    if JSON_BACKEND == "orjson":
+        return orjson.loads(data)  # pyright: ignore [reportOptionalMemberAccess]
+    return json.loads(data)
+
+
+def load_file(file_path):
+    with open(file_path, "rb") as json_file:
+        return loads(json_file.read())
+
+
+def response_json(response):
+    # The parsed body is kept on the response, so however many steps check a
+    # response its body is only decoded once. Don't change what is returned.
+    parsed = response.__dict__.get("_parsed_json")
+    if parsed is None:
+        parsed = response._parsed_json = loads(response.content)
+    return parsed
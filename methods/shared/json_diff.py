@@ -0,0 +1,155 @@
+import collections
+import itertools
+import json
+
+# Keys left out of comparisons wherever they appear, as their values change on
+# every request
+VOLATILE_KEYS = frozenset({"id", "lastUpdated", "timestamp"})
+# Keys whose arrays are compared ignoring order, like the issues in an
+# OperationOutcome, which aren't guaranteed to come back in the same order
+UNORDERED_KEYS = frozenset({"issue"})
+
+
+class JsonDifference:
+    def __init__(self, path, expected, actual, reason) -> None:
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+        self.reason = reason
+
+    def __str__(self) -> str:
+        return (
+            f"{self.path or '$'}: {self.reason},"
+            f" expected {self.expected!r}, got {self.actual!r}"
+        )
+
+    def __repr__(self) -> str:
+        return f"JsonDifference({self})"
+
+
+def fingerprint(value, ignore_keys=VOLATILE_KEYS):
+    # the same string for values that compare equal, so array items can be
+    # matched up by hashing instead of comparing every pair
+    return json.dumps(without_keys(value, ignore_keys), sort_keys=True)
+
+
+def without_keys(value, ignore_keys):
+    if isinstance(value, dict):
+        return {
+            key: without_keys(item, ignore_keys)
+            for key, item in value.items()
+            if key not in ignore_keys
+        }
+    if isinstance(value, list):
+        return [without_keys(item, ignore_keys) for item in value]
+    return value
+
+
+def iter_differences(
+    expected, actual, path="", ignore_keys=VOLATILE_KEYS, unordered_keys=UNORDERED_KEYS
+):
+    # Differences are made as they are found, so a caller can stop at the first
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        yield from dict_differences(expected, actual, path, ignore_keys, unordered_keys)
+    elif isinstance(expected, list) and isinstance(actual, list):
+        key = path.rpartition(".")[2]
+        if key in unordered_keys:
+            yield from unordered_differences(
+                expected, actual, path, ignore_keys, unordered_keys
+            )
+        else:
+            yield from list_differences(
+                expected, actual, path, ignore_keys, unordered_keys
+            )
+    elif expected != actual or isinstance(expected, bool) != isinstance(actual, bool):
+        yield JsonDifference(path, expected, actual, "values differ")
+
+
+def dict_differences(expected, actual, path, ignore_keys, unordered_keys):
+    for key, value in expected.items():
+        if key in ignore_keys:
+            continue
+        if key not in actual:
+            yield JsonDifference(f"{path}.{key}", value, None, "missing")
+        else:
+            yield from iter_differences(
+                value, actual[key], f"{path}.{key}", ignore_keys, unordered_keys
+            )
+    for key, value in actual.items():
+        if key not in expected and key not in ignore_keys:
+            yield JsonDifference(f"{path}.{key}", None, value, "unexpected")
+
+
+def list_differences(expected, actual, path, ignore_keys, unordered_keys):
+    if len(expected) != len(actual):
+        yield JsonDifference(
+            path, len(expected), len(actual), "arrays are different lengths"
+        )
+    for index, (expected_item, actual_item) in enumerate(zip(expected, actual)):
+        yield from iter_differences(
+            expected_item,
+            actual_item,
+            f"{path}[{index}]",
+            ignore_keys,
+            unordered_keys,
+        )
+
+
+def unordered_differences(expected, actual, path, ignore_keys, unordered_keys):
+    # Usually the items are in the same order, which is quicker to check than
+    # hashing them all
+    if len(expected) == len(actual) and not any(
+        any(iter_differences(e, a, path, ignore_keys, unordered_keys))
+        for e, a in zip(expected, actual)
+    ):
+        return
+    expected_prints = [fingerprint(item, ignore_keys) for item in expected]
+    actual_prints = [fingerprint(item, ignore_keys) for item in actual]
+    unmatched = collections.Counter(expected_prints)
+    unmatched.subtract(actual_prints)
+    if not any(unmatched.values()):
+        return
+    missing = []
+    for index, item_print in enumerate(expected_prints):
+        if unmatched[item_print] > 0:
+            unmatched[item_print] -= 1
+            missing.append(index)
+    unexpected = []
+    for index, item_print in enumerate(actual_prints):
+        if unmatched[item_print] < 0:
+            unmatched[item_print] += 1
+            unexpected.append(index)
+    # the items left over on each side are paired up in order and compared, so
+    # a changed item is reported as what changed in it
+    paired = min(len(missing), len(unexpected))
+    for expected_index, actual_index in zip(missing, unexpected):
+        yield from iter_differences(
+            expected[expected_index],
+            actual[actual_index],
+            f"{path}[{expected_index}]",
+            ignore_keys,
+            unordered_keys,
+        )
+    for index in missing[paired:]:
+        yield JsonDifference(f"{path}[{index}]", expected[index], None, "missing")
+    for index in unexpected[paired:]:
+        yield JsonDifference(f"{path}[{index}]", None, actual[index], "unexpected")
+
+
+def diff_json(
+    expected,
+    actual,
+    fast=False,
+    ignore_keys=VOLATILE_KEYS,
+    unordered_keys=UNORDERED_KEYS,
+):
+    # Every difference, or in fast mode just the first, which is enough to
+    # know the documents don't match
+    differences = iter_differences(expected, actual, "", ignore_keys, unordered_keys)
+    if fast:
+        return list(itertools.islice(differences, 1))
+    return list(differences)
+
+
+def format_differences(differences):
+    return "\n".join(str(difference) for difference in differences)
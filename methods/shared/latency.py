@@ -0,0 +1,96 @@
+import json
+import math
+import os
+import threading
+from urllib.parse import urlsplit
+
+LATENCY_REPORT_PATH = "reports/api_latency.json"
+
+# endpoint -> request durations in milliseconds
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def endpoint_name(method, url):
+    # Logical endpoint, e.g. "POST $process-message#prescription-order",
+    # "POST Task/$release", "GET _ping" or "GET Bundle"
+    parts = urlsplit(url)
+    path = parts.path.rstrip("/")
+    if "/FHIR/R4/" in path:
+        name = path.split("/FHIR/R4/", 1)[1]
+    else:
+        name = path.rsplit("/", 1)[-1]
+    if parts.fragment:
+        name = f"{name}#{parts.fragment}"
+    return f"{method} {name}"
+
+
+def record(endpoint, seconds):
+    with _timings_lock:
+        _timings.setdefault(endpoint, []).append(round(seconds * 1000, 3))
+
+
+def percentile(sorted_values, percent):
+    # nearest-rank percentile of an already sorted list
+    rank = max(math.ceil(percent / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarise(timings):
+    summary = {}
+    for endpoint, values in sorted(timings.items()):
+        values = sorted(values)
+        summary[endpoint] = {
+            "count": len(values),
+            "mean_ms": round(sum(values) / len(values), 3),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+            "max_ms": values[-1],
+        }
+    return summary
+
+
+def report():
+    with _timings_lock:
+        timings = {endpoint: list(values) for endpoint, values in _timings.items()}
+    return {"summary": summarise(timings), "timings": timings}
+
+
+def write_report(file_path=LATENCY_REPORT_PATH):
+    latency_report = report()
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(file_path, "w") as report_file:
+        json.dump(latency_report, report_file, indent=2)
+    return latency_report
+
+
+def merge_reports(report_paths, output_path=LATENCY_REPORT_PATH):
+    # The raw timings are kept in each report so percentiles can be recomputed
+    timings = {}
+    for report_path in report_paths:
+        if not os.path.exists(report_path):
+            continue
+        with open(report_path) as report_file:
+            for endpoint, values in json.load(report_file)["timings"].items():
+                timings.setdefault(endpoint, []).extend(values)
+    with open(output_path, "w") as report_file:
+        json.dump(
+            {"summary": summarise(timings), "timings": timings}, report_file, indent=2
+        )
+
+
+def format_summary(summary):
+    width = max([50, *(len(endpoint) for endpoint in summary)])
+    lines = [
+        f"{'endpoint':<{width}} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9}"
+        f" {'max':>9}"
+    ]
+    for endpoint, stats in summary.items():
+        lines.append(
+            f"{endpoint:<{width}} {stats['count']:>6} {stats['p50_ms']:>9.1f}"
+            f" {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,57 @@
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Request and response bodies longer than this are cut short in the logs
+LOG_BODY_MAX_LENGTH = int(os.getenv("LOG_BODY_MAX_LENGTH", "2000"))
+
+_listener = None
+
+
+class LogBody:
+    # A request or response body that is only decoded and cut down to
+    # LOG_BODY_MAX_LENGTH when a log record with it is actually written
+    def __init__(self, body) -> None:
+        self.body = body
+
+    def __str__(self) -> str:
+        body = self.body
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", errors="replace")
+        body = str(body)
+        if len(body) <= LOG_BODY_MAX_LENGTH:
+            return body
+        return (
+            f"{body[:LOG_BODY_MAX_LENGTH]}..."
+            f" ({len(body) - LOG_BODY_MAX_LENGTH} more characters)"
+        )
+
+
+class DeferredQueueHandler(QueueHandler):
+    # QueueHandler formats each record before queueing it, in the thread that
+    # logged it. The records stay in this process, so they are queued as they
+    # are and formatted by the listener's handlers on the listener's thread.
+    def prepare(self, record):
+        return record
+
+
+def start_queue_logging(handlers, level=logging.INFO):
+    # Every record goes through a queue to one background thread writing to
+    # the handlers, so logging never waits on stdout
+    global _listener
+    stop_queue_logging()
+    log_queue = queue.SimpleQueue()
+    logging.basicConfig(
+        level=level, handlers=[DeferredQueueHandler(log_queue)], force=True
+    )
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_queue_logging():
+    # writes out anything still queued
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,78 @@
+import functools
+import os
+import time
+
+from jsonschema import Draft202012Validator
+from referencing import Registry, Resource
+
+from methods.shared import latency
+from methods.shared.json_backend import load_file, response_json
+
+SCHEMA_DIRECTORY = os.path.join("messages", "schemas")
+# Set VALIDATE_RESPONSES=true to check every API response against its schema
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "false").lower() == "true"
+
+# endpoint, as latency.endpoint_name gives it -> the schema its responses follow
+ENDPOINT_SCHEMAS = {
+    "POST $prepare": "prepare_parameters",
+    "POST Task/$release": "release_parameters",
+    "GET Bundle": "pfp_search_bundle",
+}
+
+
+@functools.lru_cache(maxsize=None)
+def schema_registry():
+    # every schema, so the $refs between them resolve without reading files
+    schemas = [
+        load_file(os.path.join(SCHEMA_DIRECTORY, file_name))
+        for file_name in sorted(os.listdir(SCHEMA_DIRECTORY))
+        if file_name.endswith(".json")
+    ]
+    return Registry().with_resources(
+        (schema["$id"], Resource.from_contents(schema)) for schema in schemas
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def get_validator(schema_name):
+    # Built and checked once per run, then reused for every response
+    registry = schema_registry()
+    schema = registry.contents(f"{schema_name}.json")
+    Draft202012Validator.check_schema(schema)
+    return Draft202012Validator(schema, registry=registry)
+
+
+def compile_validators():
+    # Called before the first request, so no request pays for building them
+    for schema_name in {"operation_outcome", *ENDPOINT_SCHEMAS.values()}:
+        get_validator(schema_name)
+
+
+def schema_for(endpoint, document):
+    if (
+        isinstance(document, dict)
+        and document.get("resourceType") == "OperationOutcome"
+    ):
+        return "operation_outcome"
+    return ENDPOINT_SCHEMAS.get(endpoint)
+
+
+def check_response(endpoint, response):
+    # Responses without a schema, like the ping endpoints, aren't checked
+    if "json" not in response.headers.get("Content-Type", ""):
+        return
+    schema_name = schema_for(endpoint, response_json(response))
+    if schema_name is None:
+        return
+    started = time.perf_counter()
+    errors = sorted(
+        get_validator(schema_name).iter_errors(response_json(response)),
+        key=lambda error: error.json_path,
+    )
+    # reported alongside the API latency, e.g. "validate pfp_search_bundle"
+    latency.record(f"validate {schema_name}", time.perf_counter() - started)
+    if errors:
+        raise AssertionError(
+            f"{endpoint} response doesn't match the {schema_name} schema:\n"
+            + "\n".join(f"{error.json_path}: {error.message}" for error in errors[:20])
+        )
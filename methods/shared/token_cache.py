@@ -0,0 +1,82 @@
+import fcntl
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# Refresh cached tokens this long before they expire
+TOKEN_EXPIRY_MARGIN_SECONDS = 60
+TOKEN_CACHE_DIRECTORY = os.getenv(
+    "TOKEN_CACHE_DIRECTORY",
+    os.path.join(os.path.expanduser("~"), ".cache", "eps-regression-tests", "tokens"),
+)
+DISK_TOKEN_CACHE = os.getenv("DISK_TOKEN_CACHE", "True").lower() in (
+    "true",
+    "1",
+    "yes",
+)
+
+# cache key -> (access token, expiry as a time.time() value)
+_token_cache = {}
+
+
+def _is_fresh(expires_at):
+    return time.time() < expires_at - TOKEN_EXPIRY_MARGIN_SECONDS
+
+
+def _cache_path(key, extension):
+    name = hashlib.sha256(json.dumps(key).encode("utf-8")).hexdigest()
+    return os.path.join(TOKEN_CACHE_DIRECTORY, f"{name}.{extension}")
+
+
+@contextmanager
+def _exclusive_lock(key):
+    # Held while a token is read and, if needed, refreshed, so only one process
+    # (or thread) logs in for a key and the others pick up its token afterwards
+    os.makedirs(TOKEN_CACHE_DIRECTORY, mode=0o700, exist_ok=True)
+    descriptor = os.open(_cache_path(key, "lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(descriptor, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(descriptor, fcntl.LOCK_UN)
+        os.close(descriptor)
+
+
+def _read(key):
+    try:
+        with open(_cache_path(key, "json")) as cache_file:
+            entry = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    return entry["access_token"], entry["expires_at"]
+
+
+def _write(key, token, expires_at):
+    path = _cache_path(key, "json")
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    descriptor = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, "w") as cache_file:
+        json.dump({"access_token": token, "expires_at": expires_at}, cache_file)
+    os.replace(temporary_path, path)
+
+
+def get_token(key, fetch_token):
+    # fetch_token is only called when no process has a fresh token for key cached.
+    # It must return an (access token, expiry as a time.time() value) pair.
+    cached_token = _token_cache.get(key)
+    if cached_token is not None and _is_fresh(cached_token[1]):
+        return cached_token[0]
+
+    if not DISK_TOKEN_CACHE:
+        _token_cache[key] = fetch_token()
+        return _token_cache[key][0]
+
+    with _exclusive_lock(key):
+        cached_token = _read(key)
+        if cached_token is None or not _is_fresh(cached_token[1]):
+            cached_token = fetch_token()
+            _write(key, *cached_token)
+        _token_cache[key] = cached_token
+    return cached_token[0]
@@ -1,7 +1,257 @@
 import argparse
+import json
+import os
 import subprocess
+import sys
+import tempfile
+from uuid import uuid4
+
+from methods.shared import latency
+from utils.run_history import scenario_durations
+
+CUCUMBER_JSON_PATH = "reports/cucumber_json.json"
+ALLURE_RESULTS_DIRECTORY = "allure-results"
+WORKER_REPORTS_DIRECTORY = "reports/workers"
+# Shared by every worker so the run history groups their results together
+RUN_ID = str(uuid4())
+
+
+def behave_options(argument):
+    # Convert to behave commandline args
+    product_tag = argument.product.lower().replace("-", "_")
+    if argument.tags:
+        tags = f" --tags {product_tag} --tags {argument.tags} "
+    else:
+        tags = f" --tags {product_tag}"
+    PRODUCT = f" -D product={argument.product}"
+    ENV = f" -D env={argument.env} -D run_id={RUN_ID}"
+    return PRODUCT, ENV, tags
+
+
+def build_command(
+    argument,
+    cucumber_json_path=CUCUMBER_JSON_PATH,
+    locations=None,
+    latency_report_path=latency.LATENCY_REPORT_PATH,
+):
+    PRODUCT, ENV, tags = behave_options(argument)
+    features = " ".join(locations) if locations else "features"
+    return (
+        f"behave{PRODUCT}{ENV} -D latency_report={latency_report_path}"
+        f" -f behave_cucumber_formatter:PrettyCucumberJSONFormatter"
+        f" -o {cucumber_json_path}"
+        f" -f methods.shared.allure_store:ContentAddressedAllureFormatter"
+        f" -o {ALLURE_RESULTS_DIRECTORY}"
+        f" -f pretty {features}"
+        f" --no-logcapture --no-skipped --expand --logging-level={argument.log_level}{tags}"
+    )
+
+
+def select_scenarios(argument):
+    # A dry run evaluates the tag expression without executing any steps or hooks
+    PRODUCT, ENV, tags = behave_options(argument)
+    with tempfile.TemporaryDirectory() as directory:
+        output_path = os.path.join(directory, "scenarios.json")
+        command = (
+            f"behave{PRODUCT}{ENV} --dry-run --no-summary"
+            f" -f json -o {output_path} features{tags}"
+        )
+        subprocess.run(command, shell=True, check=True, stdout=subprocess.DEVNULL)
+        with open(output_path) as output:
+            features = json.load(output)
+    return [
+        element["location"]
+        for feature in features
+        for element in feature.get("elements", [])
+        if element["type"] == "scenario" and element.get("status") != "skipped"
+    ]
+
+
+def load_durations(report_path):
+    # Scenario wall time in seconds keyed by location, from a previous cucumber report
+    durations = {}
+    if not report_path or not os.path.exists(report_path):
+        return durations
+    with open(report_path) as report:
+        for feature in json.load(report):
+            for element in feature.get("elements", []):
+                if element.get("type") != "scenario":
+                    continue
+                durations[element["location"]] = (
+                    sum(
+                        step.get("result", {}).get("duration", 0)
+                        for step in element.get("steps", [])
+                    )
+                    / 1e9
+                )
+    return durations
+
+
+def balance(locations, durations, count):
+    # Longest-processing-time-first: hand each scenario, slowest first, to the
+    # bucket with the least total duration. Ties are broken by location and bucket
+    # index so every node computes the same assignment from the same inputs.
+    known = sorted(
+        durations[location] for location in locations if location in durations
+    )
+    default = known[len(known) // 2] if known else 1.0
+    buckets = [[] for _ in range(count)]
+    loads = [0.0] * count
+    for location in sorted(
+        locations, key=lambda location: (-durations.get(location, default), location)
+    ):
+        index = min(range(count), key=lambda index: (loads[index], index))
+        buckets[index].append(location)
+        loads[index] += durations.get(location, default)
+    # behave expects the locations of a feature file to be given together
+    return [sorted(bucket) for bucket in buckets]
+
+
+def parse_shard(value):
+    try:
+        index, total = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"shard must look like 'i/N', got '{value}'")
+    if total < 1 or not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(f"shard index must be within 1..N: '{value}'")
+    return index, total
+
+
+def merge_cucumber_reports(report_paths, output_path=CUCUMBER_JSON_PATH):
+    # Scenarios from one feature can be split across workers, so merge by feature
+    features = {}
+    for report_path in report_paths:
+        if not os.path.exists(report_path):
+            continue
+        with open(report_path) as report:
+            for feature in json.load(report):
+                merged = features.setdefault(feature["uri"], feature)
+                if merged is not feature:
+                    merged["elements"].extend(feature.get("elements", []))
+    for feature in features.values():
+        feature["elements"].sort(key=lambda element: element.get("line", 0))
+    with open(output_path, "w") as output:
+        json.dump(list(features.values()), output, indent=2)
+
+
+def nhs_number_worker(argument, index=0):
+    # Which share of the test NHS numbers a behave process takes patients from,
+    # so no two workers or shards of a run use the same patient
+    workers = max(argument.workers, 1)
+    shard_index, shards = argument.shard or (1, 1)
+    return f"{(shard_index - 1) * workers + index}/{shards * workers}"
+
+
+def behave_environment(argument, index=0):
+    # behave loads the allure formatter from this repo before it has put the
+    # repo on the import path, so it is added here
+    python_path = os.pathsep.join(
+        path for path in (os.getcwd(), os.getenv("PYTHONPATH")) if path
+    )
+    return {
+        **os.environ,
+        "NHS_NUMBER_WORKER": nhs_number_worker(argument, index),
+        "PYTHONPATH": python_path,
+    }
+
+
+def run_serial(argument, locations=None):
+    command = build_command(argument, locations=locations)
+    print(f"Running subprocess with command: '{command}'")
+    subprocess.run(command, shell=True, check=True, env=behave_environment(argument))
+
+
+def run_parallel(argument, locations, durations):
+    os.makedirs(WORKER_REPORTS_DIRECTORY, exist_ok=True)
+
+    workers = []
+    buckets = balance(locations, durations, min(argument.workers, len(locations)))
+    for index, bucket in enumerate(buckets):
+        report_path = os.path.join(WORKER_REPORTS_DIRECTORY, f"cucumber_{index}.json")
+        log_path = os.path.join(WORKER_REPORTS_DIRECTORY, f"worker_{index}.log")
+        latency_report_path = os.path.join(
+            WORKER_REPORTS_DIRECTORY, f"api_latency_{index}.json"
+        )
+        command = build_command(argument, report_path, bucket, latency_report_path)
+        print(f"Worker {index}: {len(bucket)} scenarios, logging to '{log_path}'")
+        log = open(log_path, "w")
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            env=behave_environment(argument, index),
+        )
+        workers.append(
+            (process, command, report_path, log_path, log, latency_report_path)
+        )
+
+    failures = []
+    for index, (process, command, _, log_path, log, _) in enumerate(workers):
+        return_code = process.wait()
+        log.close()
+        with open(log_path) as worker_log:
+            print(f"----- Worker {index} output -----")
+            print(worker_log.read())
+        if return_code != 0:
+            failures.append(subprocess.CalledProcessError(return_code, command))
+
+    merge_cucumber_reports([worker[2] for worker in workers])
+    latency.merge_reports([worker[5] for worker in workers])
+    if failures:
+        raise failures[0]
+
+
+def run(argument):
+    if argument.workers <= 1 and argument.shard is None:
+        run_serial(argument)
+        return
+
+    locations = select_scenarios(argument)
+    if not locations:
+        raise RuntimeError("no tests to run. Check your tags and try again")
+    if argument.durations:
+        durations = load_durations(argument.durations)
+    elif argument.history:
+        durations = scenario_durations(
+            argument.product.upper(), database_path=argument.history
+        )
+    else:
+        durations = None
+
+    if argument.shard is not None:
+        index, total = argument.shard
+        # Every runner has to make the same split, so shards are only weighted
+        # by a durations or history file they are all given. This runner's own
+        # history may differ from the others', so without one every scenario
+        # counts the same.
+        if durations is None:
+            print("No --durations or --history given, so shards are split evenly")
+        locations = balance(locations, durations or {}, total)[index - 1]
+        print(f"Shard {index}/{total}: {len(locations)} scenarios")
+        if not locations:
+            print("No scenarios assigned to this shard")
+            return
+
+    if argument.workers > 1:
+        if durations is None:
+            # only splits scenarios within this runner, so its own history will do
+            durations = scenario_durations(argument.product.upper()) or load_durations(
+                CUCUMBER_JSON_PATH
+            )
+        run_parallel(argument, locations, durations)
+    else:
+        run_serial(argument, locations)
+
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["load"]:
+        # imported here as it pulls in the whole test pack
+        from utils import load_generator
+
+        load_generator.main(sys.argv[2:])
+        sys.exit()
+
     parser = argparse.ArgumentParser()
 
     # commandline arguments
@@ -20,26 +270,34 @@ if __name__ == "__main__":
         required=False,
         help="Tags to include or exclude. use ~tag_name to exclude tags",
     )
+    parser.add_argument(
+        "--log-level",
+        default=os.getenv("LOG_LEVEL", "INFO").upper(),
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="DEBUG also logs request and response bodies",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of behave processes to split the selected scenarios across",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        required=False,
+        help="Only run shard i of N (e.g. 2/4) of the selected scenarios",
+    )
+    parser.add_argument(
+        "--durations",
+        required=False,
+        help="Cucumber report to balance shards and workers with instead of the run history",
+    )
+    parser.add_argument(
+        "--history",
+        required=False,
+        help="Run history database to balance shards and workers with",
+    )
     argument = parser.parse_args()
 
-    # Convert to behave commandline args
-    product_tag = argument.product.lower().replace("-", "_")
-    if argument.tags:
-        tags = f" --tags {product_tag} --tags {argument.tags} "
-    else:
-        tags = f" --tags {product_tag}"
-    PRODUCT = f" -D product={argument.product}"
-    ENV = f" -D env={argument.env}"
-
-    # complete command
-    command = (
-        f"behave{PRODUCT}{ENV}"
-        f" -f behave_cucumber_formatter:PrettyCucumberJSONFormatter"
-        f" -o reports/cucumber_json.json"
-        f" -f allure_behave.formatter:AllureFormatter"
-        f" -o allure-results"
-        f" -f pretty features"
-        f" --no-logcapture --no-skipped --expand --logging-level=DEBUG{tags}"
-    )
-    print(f"Running subprocess with command: '{command}'")
-    subprocess.run(command, shell=True, check=True)
+    run(argument)
@@ -0,0 +1,280 @@
+import base64
+import copy
+import hashlib
+import json
+import os
+from datetime import UTC, datetime
+
+from stubs.store import PrescriptionRecord
+
+EPS_FHIR_SERVICES = (
+    "electronic-prescriptions",
+    "fhir-prescribing",
+    "fhir-dispensing",
+)
+EXAMPLES_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "messages", "examples"
+)
+CANCELLED_STATUS_HISTORY = {
+    "url": "https://fhir.nhs.uk/StructureDefinition/Extension-DM-PrescriptionStatusHistory",
+    "extension": [
+        {
+            "url": "status",
+            "valueCoding": {
+                "system": "https://fhir.nhs.uk/CodeSystem/medicationrequest-status-history",
+                "code": "R-0008",
+                "display": "Prescription/item was cancelled",
+            },
+        }
+    ],
+}
+
+
+def operation_outcome(severity, code, diagnostics):
+    return {
+        "resourceType": "OperationOutcome",
+        "issue": [{"severity": severity, "code": code, "diagnostics": diagnostics}],
+    }
+
+
+def informational():
+    return 200, operation_outcome("information", "informational", "Message accepted")
+
+
+def bad_request(diagnostics, code="business-rule"):
+    return 400, operation_outcome("error", code, diagnostics)
+
+
+def resources(bundle, resource_type):
+    return [
+        entry["resource"]
+        for entry in bundle.get("entry", [])
+        if entry["resource"]["resourceType"] == resource_type
+    ]
+
+
+def canonical(document):
+    return json.dumps(document, sort_keys=True, separators=(",", ":"))
+
+
+def load_validator_examples():
+    # The validator's known responses to the example requests, keyed by request
+    examples = {}
+    for name in sorted(os.listdir(EXAMPLES_DIRECTORY)):
+        with open(os.path.join(EXAMPLES_DIRECTORY, name, "request.json")) as request:
+            with open(os.path.join(EXAMPLES_DIRECTORY, name, "response.json")) as f:
+                examples[canonical(json.load(request))] = json.load(f)
+    return examples
+
+
+class EpsFhirStandIn:
+    def __init__(self, store) -> None:
+        self.store = store
+        self.validator_examples = load_validator_examples()
+
+    def routes(self):
+        routes = {}
+        for service in EPS_FHIR_SERVICES:
+            routes.update(
+                {
+                    (service, "GET", "/_ping"): self.ping,
+                    (service, "POST", "/FHIR/R4/$prepare"): self.prepare,
+                    (service, "POST", "/FHIR/R4/$process-message"): self.process,
+                    (service, "POST", "/FHIR/R4/Task/$release"): self.release,
+                    (service, "POST", "/FHIR/R4/Task"): self.task,
+                    (service, "POST", "/FHIR/R4/$validate"): self.validate,
+                }
+            )
+        return routes
+
+    def ping(self, request):
+        return 200, {
+            "version": "local",
+            "revision": "local",
+            "releaseId": "local",
+            "commitId": "local",
+        }
+
+    def prepare(self, request):
+        bundle = request.json()
+        digest_value = base64.b64encode(
+            hashlib.sha1(canonical(bundle).encode("utf-8")).digest()
+        ).decode("ascii")
+        signed_info = (
+            '<SignedInfo xmlns="http://www.w3.org/2000/09/xmldsig#">'
+            '<CanonicalizationMethod Algorithm="http://www.w3.org/2001/10/xml-exc-c14n#"/>'
+            '<SignatureMethod Algorithm="http://www.w3.org/2000/09/xmldsig#rsa-sha1"/>'
+            '<Reference><Transforms><Transform Algorithm="http://www.w3.org/2001/10/xml-exc-c14n#"/>'
+            '</Transforms><DigestMethod Algorithm="http://www.w3.org/2000/09/xmldsig#sha1"/>'
+            f"<DigestValue>{digest_value}</DigestValue></Reference></SignedInfo>"
+        )
+        digest = base64.b64encode(signed_info.encode("utf-8")).decode("ascii")
+        return 200, {
+            "resourceType": "Parameters",
+            "parameter": [
+                {"name": "digest", "valueString": digest},
+                {"name": "timestamp", "valueString": datetime.now(UTC).isoformat()},
+                {"name": "algorithm", "valueString": "RS1"},
+            ],
+        }
+
+    def process(self, request):
+        bundle = request.json()
+        message_header = resources(bundle, "MessageHeader")
+        if not message_header:
+            return bad_request("Bundle must contain a MessageHeader", "invalid")
+        event = message_header[0]["eventCoding"]["code"]
+        if event == "prescription-order":
+            return self.create(bundle)
+        if event == "prescription-order-update":
+            return self.cancel(bundle)
+        if event == "dispense-notification":
+            return self.dispense(bundle, message_header[0])
+        return bad_request(f"Unsupported message event {event}", "not-supported")
+
+    def create(self, bundle):
+        provenance = resources(bundle, "Provenance")
+        if not provenance or not provenance[0]["signature"][0].get("data"):
+            return bad_request("Prescription must be signed", "invalid")
+        medication_request = resources(bundle, "MedicationRequest")[0]
+        prescription_id = medication_request["groupIdentifier"]["value"]
+        if self.store.get(prescription_id) is not None:
+            return bad_request(f"Duplicate prescription id {prescription_id}")
+        nhs_number = resources(bundle, "Patient")[0]["identifier"][0]["value"]
+        self.store.add(PrescriptionRecord(prescription_id, nhs_number, bundle))
+        return informational()
+
+    def cancel(self, bundle):
+        medication_requests = resources(bundle, "MedicationRequest")
+        prescription_id = medication_requests[0]["groupIdentifier"]["value"]
+        record = self.store.get(prescription_id)
+        if record is None:
+            return bad_request(f"Prescription {prescription_id} not found", "not-found")
+        if record.status not in ("signed", "cancelled"):
+            return bad_request(
+                "Prescription is with a dispenser and cannot be cancelled"
+            )
+        record.cancelled_item_ids.update(
+            medication_request["identifier"][0]["value"]
+            for medication_request in medication_requests
+        )
+        if record.cancelled_item_ids == record.item_ids():
+            record.status = "cancelled"
+        entries = [
+            entry
+            for entry in copy.deepcopy(bundle["entry"])
+            if entry["resource"]["resourceType"] != "MedicationRequest"
+        ]
+        for medication_request in copy.deepcopy(medication_requests):
+            medication_request["extension"].insert(0, CANCELLED_STATUS_HISTORY)
+            entries.append({"resource": medication_request})
+        return 200, {"resourceType": "Bundle", "type": "message", "entry": entries}
+
+    def dispense(self, bundle, message_header):
+        medication_dispense = resources(bundle, "MedicationDispense")[0]
+        medication_request = [
+            resource
+            for resource in medication_dispense["contained"]
+            if resource["resourceType"] == "MedicationRequest"
+        ][0]
+        record = self.store.get(medication_request["groupIdentifier"]["value"])
+        if record is None:
+            return bad_request("Prescription not found", "not-found")
+        replacement_of = [
+            extension
+            for extension in message_header.get("extension", [])
+            if extension["url"].endswith("Extension-replacementOf")
+        ]
+        if replacement_of:
+            previous_id = replacement_of[0]["valueIdentifier"]["value"]
+            if previous_id not in record.dispense_notification_ids:
+                return bad_request(f"Dispense notification {previous_id} not found")
+        elif record.status != "released":
+            return bad_request(f"Prescription is {record.status}, not released")
+        record.status = "dispensed"
+        record.dispense_notification_ids.append(bundle["identifier"]["value"])
+        return informational()
+
+    def release(self, request):
+        parameters = {
+            parameter["name"]: parameter for parameter in request.json()["parameter"]
+        }
+        if "group-identifier" not in parameters:
+            return bad_request("Only releases by group-identifier are supported")
+        prescription_id = parameters["group-identifier"]["valueIdentifier"]["value"]
+        record = self.store.get(prescription_id)
+        if record is None:
+            return bad_request(f"Prescription {prescription_id} not found", "not-found")
+        if record.status != "signed":
+            return bad_request(
+                f"Prescription is {record.status} and cannot be released"
+            )
+        record.status = "released"
+        return 200, {
+            "resourceType": "Parameters",
+            "parameter": [
+                {
+                    "name": "passedPrescriptions",
+                    "resource": {
+                        "resourceType": "Bundle",
+                        "type": "searchset",
+                        "total": 1,
+                        "entry": [{"resource": record.bundle}],
+                    },
+                }
+            ],
+        }
+
+    def task(self, request):
+        task = request.json()
+        record = self.store.get(task["groupIdentifier"]["value"])
+        if record is None:
+            return bad_request("Prescription not found", "not-found")
+        if task["status"] == "rejected":
+            # return: the prescription goes back to be released again
+            if record.status != "released":
+                return bad_request(f"Prescription is {record.status}, not released")
+            record.status = "signed"
+            return informational()
+        if task["code"]["coding"][0]["code"] == "abort":
+            # withdraw the most recent dispense notification
+            dispense_notification_id = task["focus"]["identifier"]["value"]
+            if record.dispense_notification_ids[-1:] != [dispense_notification_id]:
+                return bad_request(
+                    "Only the last dispense notification can be withdrawn"
+                )
+            record.dispense_notification_ids.pop()
+            if not record.dispense_notification_ids:
+                record.status = "released"
+            return informational()
+        return bad_request("Unsupported Task", "not-supported")
+
+    def validate(self, request):
+        try:
+            document = request.json()
+        except ValueError:
+            return 400, operation_outcome(
+                "error", "processing", "Failed to parse JSON encoded FHIR content"
+            )
+        example_response = self.validator_examples.get(canonical(document))
+        if example_response is not None:
+            return 400, example_response
+        if request.headers.get("x-show-validation-warnings") == "true":
+            return 400, {
+                "resourceType": "OperationOutcome",
+                "issue": [
+                    {
+                        "severity": "information",
+                        "code": "informational",
+                        "diagnostics": "Validation warnings are reported as information",
+                    },
+                    {
+                        "severity": "information",
+                        "code": "informational",
+                        "diagnostics": "Validation successful",
+                    },
+                ],
+            }
+        return 200, operation_outcome(
+            "information", "informational", "Validation successful"
+        )
@@ -0,0 +1,94 @@
+import copy
+
+PFP_SERVICE = "prescriptions-for-patients"
+PRESCRIPTION_STATUS_HISTORY_URL = (
+    "https://fhir.nhs.uk/StructureDefinition/Extension-DM-PrescriptionStatusHistory"
+)
+
+
+def medication_request_for_patient(medication_request, nhs_number, item_updates):
+    medication_request = copy.deepcopy(medication_request)
+    medication_request["subject"] = {
+        "identifier": {
+            "system": "https://fhir.nhs.uk/Id/nhs-number",
+            "value": nhs_number,
+        }
+    }
+    item_id = medication_request["identifier"][0]["value"].lower()
+    if item_id in item_updates:
+        business_status, status = item_updates[item_id]
+        medication_request["status"] = status
+        medication_request["extension"].insert(
+            0,
+            {
+                "url": PRESCRIPTION_STATUS_HISTORY_URL,
+                "extension": [
+                    {
+                        "url": "status",
+                        "valueCoding": {
+                            "system": "https://fhir.nhs.uk/CodeSystem/task-businessStatus-nppt",
+                            "code": business_status,
+                        },
+                    }
+                ],
+            },
+        )
+    return medication_request
+
+
+class PfpStandIn:
+    def __init__(self, store) -> None:
+        self.store = store
+
+    def routes(self):
+        return {
+            (PFP_SERVICE, "GET", "/_ping"): self.ping,
+            (PFP_SERVICE, "GET", "/Bundle"): self.search,
+        }
+
+    def ping(self, request):
+        return 200, {
+            "version": "local",
+            "revision": "local",
+            "releaseId": "local",
+            "commitId": "local",
+        }
+
+    def search(self, request):
+        nhs_number = request.headers.get("x-nhs-number")
+        if not nhs_number:
+            return 400, {
+                "resourceType": "OperationOutcome",
+                "issue": [
+                    {
+                        "severity": "error",
+                        "code": "value",
+                        "diagnostics": "x-nhs-number header is required",
+                    }
+                ],
+            }
+        # most recent prescription first
+        prescriptions = [
+            {
+                "resource": {
+                    "resourceType": "Bundle",
+                    "type": "collection",
+                    "entry": [
+                        {
+                            "resource": medication_request_for_patient(
+                                entry["resource"], nhs_number, record.item_updates
+                            )
+                        }
+                        for entry in record.bundle["entry"]
+                        if entry["resource"]["resourceType"] == "MedicationRequest"
+                    ],
+                }
+            }
+            for record in reversed(self.store.for_patient(nhs_number))
+        ]
+        return 200, {
+            "resourceType": "Bundle",
+            "type": "searchset",
+            "total": len(prescriptions),
+            "entry": prescriptions,
+        }
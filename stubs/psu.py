@@ -0,0 +1,60 @@
+from uuid import uuid4
+
+PSU_SERVICE = "prescription-status-update"
+
+
+class PsuStandIn:
+    def __init__(self, store) -> None:
+        self.store = store
+
+    def routes(self):
+        return {(PSU_SERVICE, "POST", "/"): self.status_update}
+
+    def status_update(self, request):
+        bundle = request.json()
+        if (
+            bundle.get("resourceType") != "Bundle"
+            or bundle.get("type") != "transaction"
+        ):
+            return 400, {
+                "resourceType": "OperationOutcome",
+                "issue": [
+                    {
+                        "severity": "error",
+                        "code": "value",
+                        "diagnostics": "Request body must be a transaction Bundle",
+                    }
+                ],
+            }
+        entries = []
+        for entry in bundle.get("entry", []):
+            task = entry["resource"]
+            self.store.update_item(
+                task["basedOn"][0]["identifier"]["value"],
+                task["focus"]["identifier"]["value"].lower(),
+                task["businessStatus"]["coding"][0]["code"],
+                task["status"],
+            )
+            entries.append(
+                {
+                    "fullUrl": entry.get("fullUrl", f"urn:uuid:{uuid4()}"),
+                    "response": {
+                        "status": "201 Created",
+                        "outcome": {
+                            "resourceType": "OperationOutcome",
+                            "issue": [
+                                {
+                                    "severity": "information",
+                                    "code": "success",
+                                    "diagnostics": "Data submitted successfully.",
+                                }
+                            ],
+                        },
+                    },
+                }
+            )
+        return 201, {
+            "resourceType": "Bundle",
+            "type": "transaction-response",
+            "entry": entries,
+        }
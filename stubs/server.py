@@ -0,0 +1,148 @@
+#####################################################################
+# Local stand-in for the APIs under test, for offline development   #
+# and for measuring the overhead of the test pack itself.           #
+# Run with: python -m stubs.server --port 9000                      #
+#####################################################################
+
+import argparse
+import asyncio
+import json
+import re
+import traceback
+from urllib.parse import parse_qs, urlsplit
+
+from stubs.eps_fhir import EpsFhirStandIn, operation_outcome
+from stubs.pfp import PfpStandIn
+from stubs.psu import PsuStandIn
+from stubs.store import PrescriptionStore
+
+DEFAULT_PORT = 9000
+REASON_PHRASES = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    411: "Length Required",
+    500: "Internal Server Error",
+}
+
+
+class BadRequest(ValueError):
+    # A request body the stand-ins can't read, answered with a 400. A
+    # ValueError, so handlers catching a body that isn't JSON still catch it
+    pass
+
+
+class Request:
+    def __init__(self, method, target, headers, body) -> None:
+        parts = urlsplit(target)
+        self.method = method
+        self.path = parts.path
+        self.query = parse_qs(parts.query)
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        # FHIR request bodies are always JSON objects
+        try:
+            document = json.loads(self.body)
+        except ValueError as error:
+            raise BadRequest(f"The body is not JSON: {error}")
+        if not isinstance(document, dict):
+            raise BadRequest("The body is not a JSON object")
+        return document
+
+
+def split_service(path):
+    # "/electronic-prescriptions-pr-123/FHIR/R4/$prepare" ->
+    # ("electronic-prescriptions", "/FHIR/R4/$prepare")
+    service, _, route = path.lstrip("/").partition("/")
+    return re.sub(r"-pr-\d+$", "", service), f"/{route}"
+
+
+class StandInServer:
+    def __init__(self, store=None) -> None:
+        self.store = store or PrescriptionStore()
+        self.routes = {}
+        for stand_in in (EpsFhirStandIn, PsuStandIn, PfpStandIn):
+            self.routes.update(stand_in(self.store).routes())
+
+    def dispatch(self, request):
+        service, route = split_service(request.path)
+        handler = self.routes.get((service, request.method, route))
+        if handler is None:
+            return 404, {"message": f"No stand-in for {request.method} {request.path}"}
+        # A body the stand-ins can't read gets a 400. Anything else is a bug in
+        # a stand-in and gets a 500, so it isn't mistaken for a client error.
+        # Either way the test sees a response rather than a dropped connection.
+        try:
+            return handler(request)
+        except BadRequest as error:
+            return 400, operation_outcome("error", "invalid", str(error))
+        except (KeyError, IndexError, ValueError) as error:
+            # a field missing from the body or with a value that can't be read
+            return 400, operation_outcome(
+                "error", "invalid", f"Can't read the request: {error!r}"
+            )
+        except Exception as error:
+            traceback.print_exc()
+            return 500, operation_outcome("fatal", "exception", repr(error))
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while await self.handle_request(reader, writer):
+                pass
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, reader, writer):
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return False
+        method, target, version = request_line.decode("latin-1").split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if "chunked" in headers.get("transfer-encoding", ""):
+            status, payload = 411, {"message": "Content-Length is required"}
+        else:
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            status, payload = self.dispatch(Request(method, target, headers, body))
+
+        keep_alive = (
+            version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        )
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            (
+                f"{version} {status} {REASON_PHRASES.get(status, '')}\r\n"
+                "Content-Type: application/fhir+json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+            + data
+        )
+        await writer.drain()
+        return keep_alive
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Stand-in APIs listening on http://{host}:{port}/")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local API stand-ins")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    arguments = parser.parse_args()
+
+    asyncio.run(StandInServer().serve(arguments.host, arguments.port))
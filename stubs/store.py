@@ -0,0 +1,42 @@
+class PrescriptionRecord:
+    def __init__(self, prescription_id, nhs_number, bundle) -> None:
+        self.prescription_id = prescription_id
+        self.nhs_number = nhs_number
+        self.bundle = bundle
+        self.status = "signed"
+        self.dispense_notification_ids = []
+        self.cancelled_item_ids = set()
+        # prescription item id -> (business status, task status) from PSU
+        self.item_updates = {}
+
+    def item_ids(self):
+        return {
+            entry["resource"]["identifier"][0]["value"]
+            for entry in self.bundle["entry"]
+            if entry["resource"]["resourceType"] == "MedicationRequest"
+        }
+
+
+class PrescriptionStore:
+    # Shared in-memory state so each stand-in sees what the others have done
+    def __init__(self) -> None:
+        self.prescriptions = {}
+        self.prescriptions_by_nhs_number = {}
+
+    def add(self, record):
+        self.prescriptions[record.prescription_id] = record
+        self.prescriptions_by_nhs_number.setdefault(record.nhs_number, []).append(
+            record
+        )
+
+    def get(self, prescription_id):
+        return self.prescriptions.get(prescription_id)
+
+    def for_patient(self, nhs_number):
+        return self.prescriptions_by_nhs_number.get(nhs_number, [])
+
+    def update_item(self, prescription_id, item_id, business_status, status):
+        # PSU accepts updates for any prescription, but only known ones are kept
+        record = self.get(prescription_id)
+        if record is not None:
+            record.item_updates[item_id] = (business_status, status)
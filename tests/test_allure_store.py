@@ -0,0 +1,41 @@
+import hashlib
+
+import allure_commons
+from allure_commons.logger import AllureFileLogger
+from behave.configuration import Configuration
+from behave.formatter.base import StreamOpener
+
+from methods.shared.allure_store import (
+    ContentAddressedAllureFormatter,
+    ContentAddressedFileLogger,
+)
+
+
+def registered_file_loggers():
+    return [
+        plugin
+        for plugin in allure_commons.plugin_manager.get_plugins()
+        if isinstance(plugin, AllureFileLogger)
+    ]
+
+
+def test_formatter_replaces_the_file_logger(tmp_path):
+    config = Configuration(command_args=[], load_config=False)
+    formatter = ContentAddressedAllureFormatter(
+        StreamOpener(filename=str(tmp_path)), config
+    )
+    try:
+        assert registered_file_loggers() == [formatter.file_logger]
+        assert isinstance(formatter.file_logger, ContentAddressedFileLogger)
+
+        for _ in range(2):
+            allure_commons.plugin_manager.hook.report_attached_data(
+                body="same body", file_name=f"{_}-attachment.txt"
+            )
+        digest = hashlib.sha256(b"same body").hexdigest()
+        assert [path.name for path in tmp_path.iterdir()] == [
+            f"{digest}-attachment.txt"
+        ]
+    finally:
+        for plugin in [formatter.file_logger, formatter.listener]:
+            allure_commons.plugin_manager.unregister(plugin)
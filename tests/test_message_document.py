@@ -0,0 +1,70 @@
+import json
+from types import SimpleNamespace
+
+# eps_api_methods has to be imported before features.environment
+import methods.api.eps_api_methods  # noqa: F401
+from messages import document
+from messages.document import MessageDocument
+from messages.eps_fhir import signed_prescription
+from messages.eps_fhir.cancel import Cancel
+from messages.eps_fhir.prescription import Prescription
+from messages.eps_fhir.signed_prescription import SignedPrescription
+
+
+def prepared_context(line_item_count=2):
+    context = SimpleNamespace(
+        nhs_number="9449304130",
+        nomination_code="P1",
+        line_item_count=line_item_count,
+        digest="ZGlnZXN0",
+        timestamp="2026-01-01T00:00:00+00:00",
+        algorithm="RS1",
+    )
+    context.prescription_document = MessageDocument.from_body(
+        Prescription(context).body, entry_last=True
+    )
+    context.prescription_document.encoded
+    return context
+
+
+def test_signing_does_not_parse_the_prepared_body(monkeypatch):
+    context = prepared_context()
+    prepared_body = context.prescription_document.body
+    monkeypatch.setattr(signed_prescription, "get_signature", lambda *_: "c2ln")
+
+    def loads(data):
+        raise AssertionError("signing parsed the prescription")
+
+    monkeypatch.setattr(document, "loads", loads)
+    signed = SignedPrescription(context).document
+    body, encoded = signed.body, signed.encoded
+    monkeypatch.undo()
+
+    expected = json.loads(prepared_body)
+    provenance = json.loads(body)["entry"][-1]
+    expected["entry"].append(provenance)
+    assert json.loads(body) == expected
+    assert encoded == body.encode("utf-8")
+    assert provenance["resource"]["target"] == [
+        {"reference": f"urn:uuid:{medication_request_id}"}
+        for medication_request_id in context.medication_request_ids
+    ]
+    # the prepared document is unchanged
+    assert context.prescription_document.body == prepared_body
+
+
+def test_cancel_does_not_change_the_prepared_document():
+    context = prepared_context()
+    prepared = json.loads(context.prescription_document.body)
+
+    for item_number in (1, 2):
+        cancel = json.loads(Cancel(context, [item_number]).document.body)
+        medication_requests = [
+            entry["resource"]
+            for entry in cancel["entry"]
+            if entry["resource"]["resourceType"] == "MedicationRequest"
+        ]
+        assert [request["status"] for request in medication_requests] == ["cancelled"]
+        assert cancel["identifier"]["value"] == cancel["id"] != prepared["id"]
+
+    assert context.prescription_document.resource == prepared
@@ -0,0 +1,86 @@
+import json
+import os
+import re
+from types import SimpleNamespace
+
+import pytest
+
+# eps_api_methods has to be imported before features.environment
+import methods.api.eps_api_methods  # noqa: F401
+from messages.eps_fhir.dispense_notification import DispenseNotification
+from messages.eps_fhir.prescription import NOMINATION_CODES, Prescription
+from messages.eps_fhir.prescription_return import Return
+from messages.eps_fhir.release import Release
+from messages.eps_fhir.withdraw_dispense_notification import (
+    WithdrawDispenseNotification,
+)
+
+# The golden bodies were made by the message builders as they were before the
+# messages were templated (the parent of the commit adding messages/template.py),
+# for one line item, and normalised as below
+GOLDEN_DIRECTORY = os.path.join(os.path.dirname(__file__), "golden", "messages")
+NHS_NUMBER = "9449304130"
+
+# message name -> function making the message from a context, in lifecycle
+# order as later messages use ids from earlier ones
+MESSAGES = {
+    "prescription": Prescription,
+    "release": Release,
+    "dispense_notification": lambda context: DispenseNotification(context, False),
+    "amended_dispense_notification": lambda context: DispenseNotification(
+        context, True
+    ),
+    "withdraw_dispense_notification": WithdrawDispenseNotification,
+    "return": Return,
+}
+
+# Generated values, replaced by a placeholder numbered in order of first
+# appearance, so the messages are compared on where each id is used rather
+# than on its value. Dates and times are replaced by what they are.
+UUID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+SHORT_FORM_ID = re.compile(r"[0-9A-F]{6}-[0-9A-Z]{6}-[0-9A-F]{5}[0-9A-Z+]")
+DATE_TIME = re.compile(
+    r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?([+-]\d{2}:\d{2}|Z)?"
+)
+DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def normalise(value, placeholders=None):
+    placeholders = {} if placeholders is None else placeholders
+    if isinstance(value, dict):
+        # by key, so the placeholders don't depend on the order of the keys
+        return {
+            key: normalise(value[key], placeholders) for key in sorted(value.keys())
+        }
+    if isinstance(value, list):
+        return [normalise(item, placeholders) for item in value]
+    if not isinstance(value, str):
+        return value
+
+    def placeholder(match):
+        return placeholders.setdefault(match.group(), f"<id {len(placeholders)}>")
+
+    value = UUID.sub(placeholder, value)
+    value = SHORT_FORM_ID.sub(placeholder, value)
+    value = DATE_TIME.sub("<date time>", value)
+    return DATE.sub("<date>", value)
+
+
+def build_messages(nomination_code):
+    context = SimpleNamespace(
+        nhs_number=NHS_NUMBER, nomination_code=nomination_code, line_item_count=1
+    )
+    return {
+        name: json.loads(create_message(context).body)
+        for name, create_message in MESSAGES.items()
+    }
+
+
+@pytest.mark.parametrize("nomination_code", NOMINATION_CODES)
+def test_templated_messages_match_the_original_builders(nomination_code):
+    golden_path = os.path.join(GOLDEN_DIRECTORY, f"{nomination_code}.json")
+    with open(golden_path) as golden_file:
+        golden = json.load(golden_file)
+    messages = build_messages(nomination_code)
+    for name in MESSAGES:
+        assert normalise(messages[name]) == golden[name], name
@@ -0,0 +1,123 @@
+#####################################################################
+# Compacts an allure-results directory after a run: attachments     #
+# with the same content are merged into one file named after it,    #
+# the results are pointed at that file, and the directory can be    #
+# packed into a gzip or zstd archive for upload.                    #
+# Run with: python -m utils.compact_allure_results --archive x.tgz  #
+#####################################################################
+
+import argparse
+import hashlib
+import json
+import os
+import tarfile
+
+from methods.shared.allure_store import stored_file_name
+
+ALLURE_RESULTS_DIRECTORY = "allure-results"
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as attachment:
+        for chunk in iter(lambda: attachment.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest
+
+
+def deduplicate_attachments(directory):
+    # old file name -> the content named file it has been merged into
+    sources = {}
+    for file_name in sorted(os.listdir(directory)):
+        if "-attachment" not in file_name or file_name.endswith(".tmp"):
+            continue
+        file_path = os.path.join(directory, file_name)
+        stored_name = stored_file_name(file_digest(file_path).hexdigest(), file_name)
+        if stored_name == file_name:
+            continue
+        sources[file_name] = stored_name
+        stored_path = os.path.join(directory, stored_name)
+        if os.path.exists(stored_path):
+            os.remove(file_path)
+        else:
+            os.replace(file_path, stored_path)
+    return sources
+
+
+def replace_sources(value, sources):
+    if isinstance(value, dict):
+        if value.get("source") in sources:
+            value["source"] = sources[value["source"]]
+        for item in value.values():
+            replace_sources(item, sources)
+    elif isinstance(value, list):
+        for item in value:
+            replace_sources(item, sources)
+
+
+def rewrite_results(directory, sources):
+    for file_name in os.listdir(directory):
+        if not file_name.endswith(("-result.json", "-container.json")):
+            continue
+        file_path = os.path.join(directory, file_name)
+        with open(file_path, encoding="utf-8") as result_file:
+            result = json.load(result_file)
+        replace_sources(result, sources)
+        with open(file_path, "w", encoding="utf-8") as result_file:
+            json.dump(result, result_file, ensure_ascii=False)
+
+
+def archive(directory, archive_path):
+    # gzip from the standard library, or zstd when zstandard is installed
+    if archive_path.endswith((".tar.zst", ".tzst")):
+        try:
+            import zstandard  # pyright: ignore [reportMissingImports]
+        except ImportError:
+            raise SystemExit(
+                "zstandard isn't installed, install it with 'pip install zstandard'"
+                " or archive to a .tar.gz instead"
+            )
+
+        with open(archive_path, "wb") as archive_file:
+            with zstandard.ZstdCompressor().stream_writer(archive_file) as stream:
+                with tarfile.open(fileobj=stream, mode="w|") as tar:
+                    tar.add(directory, arcname=os.path.basename(directory))
+    else:
+        with tarfile.open(archive_path, "w:gz") as tar:
+            tar.add(directory, arcname=os.path.basename(directory))
+
+
+def directory_size(directory):
+    return sum(
+        os.path.getsize(os.path.join(directory, file_name))
+        for file_name in os.listdir(directory)
+    )
+
+
+def compact(directory, archive_path=None):
+    files_before = len(os.listdir(directory))
+    bytes_before = directory_size(directory)
+    sources = deduplicate_attachments(directory)
+    if sources:
+        rewrite_results(directory, sources)
+    print(
+        f"{files_before} files, {bytes_before} bytes before;"
+        f" {len(os.listdir(directory))} files,"
+        f" {directory_size(directory)} bytes after"
+    )
+    if archive_path:
+        archive(directory, archive_path)
+        print(f"Archived to {archive_path}, {os.path.getsize(archive_path)} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge duplicate allure attachments and optionally archive them"
+    )
+    parser.add_argument("--directory", default=ALLURE_RESULTS_DIRECTORY)
+    parser.add_argument(
+        "--archive",
+        help="Also pack the directory into this .tar.gz, or .tar.zst with zstandard",
+    )
+    arguments = parser.parse_args()
+    compact(arguments.directory, arguments.archive)
@@ -0,0 +1,148 @@
+#####################################################################
+# Streams generated test data to NDJSON files, one message per      #
+# line, so the same data can be replayed without building the       #
+# messages again.                                                   #
+# Run with: python -m utils.data_factory --count 100000             #
+#####################################################################
+
+import argparse
+import itertools
+import os
+import time
+from types import SimpleNamespace
+
+# eps_api_methods has to be imported before features.environment
+import methods.api.eps_api_methods  # noqa: F401
+from messages.eps_fhir.dispense_notification import DispenseNotification
+from messages.eps_fhir.medications import MAX_LINE_ITEMS
+from messages.eps_fhir.prescription import (
+    NOMINATION_CODES,
+    SENDER_ODS_CODE,
+    Prescription,
+)
+from messages.psu.prescription_status_update import StatusUpdate
+from utils.prescription_id_generator import generate_short_form_ids
+from utils.random_nhs_number_generator import NhsNumberPool
+
+DATA_DIRECTORY = "data"
+# message kind -> (file name, function making the message body from a context)
+MESSAGES = {
+    "prescription": ("prescriptions.ndjson", lambda context: context.prepare_body),
+    "dispense-notification": (
+        "dispense_notifications.ndjson",
+        lambda context: DispenseNotification(context, False).body,
+    ),
+    "status-update": (
+        "status_updates.ndjson",
+        lambda context: StatusUpdate(context).body,
+    ),
+}
+
+
+def generate_contexts(
+    count, nomination_code="P1", line_item_count=1, worker_index=0, worker_count=1
+):
+    # One patient's prescription at a time, so memory use doesn't grow with count
+    short_form_ids = generate_short_form_ids(
+        SENDER_ODS_CODE, count, worker_index, worker_count
+    )
+    nhs_numbers = NhsNumberPool(worker_index=worker_index, worker_count=worker_count)
+    for _ in range(count):
+        context = SimpleNamespace(
+            short_form_ids=short_form_ids,
+            nhs_number=nhs_numbers.take_one(),
+            nomination_code=nomination_code,
+            line_item_count=line_item_count,
+            terminal_status="completed",
+            item_status="Collected",
+        )
+        context.prepare_body = Prescription(context).body
+        yield context
+
+
+def generate_lines(contexts, kinds):
+    # (kind, line) for each message of each context, in the order given
+    for context in contexts:
+        for kind in kinds:
+            yield kind, MESSAGES[kind][1](context) + "\n"
+
+
+def write_ndjson(lines, kinds, output_directory):
+    os.makedirs(output_directory, exist_ok=True)
+    files = {
+        kind: open(os.path.join(output_directory, MESSAGES[kind][0]), "w")
+        for kind in kinds
+    }
+    counts = dict.fromkeys(kinds, 0)
+    try:
+        for kind, line in lines:
+            files[kind].write(line)
+            counts[kind] += 1
+    finally:
+        for ndjson_file in files.values():
+            ndjson_file.close()
+    return counts
+
+
+def read_ndjson(file_path, limit=None):
+    # The message bodies in a file, one at a time and ready to send
+    with open(file_path) as ndjson_file:
+        for line in itertools.islice(ndjson_file, limit):
+            yield line.rstrip("\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Stream generated prescriptions and updates to NDJSON files"
+    )
+    parser.add_argument(
+        "--count", type=int, required=True, help="Prescriptions to generate"
+    )
+    parser.add_argument(
+        "--messages",
+        nargs="+",
+        choices=list(MESSAGES),
+        default=list(MESSAGES),
+        help="Which messages to write for each prescription",
+    )
+    parser.add_argument("--nomination-code", default="P1", choices=NOMINATION_CODES)
+    parser.add_argument(
+        "--line-items",
+        type=int,
+        default=1,
+        choices=range(1, MAX_LINE_ITEMS + 1),
+        metavar=f"1-{MAX_LINE_ITEMS}",
+    )
+    parser.add_argument("--output-directory", default=DATA_DIRECTORY)
+    parser.add_argument(
+        "--worker-index",
+        type=int,
+        default=0,
+        help="When generating in several processes, which one this is",
+    )
+    parser.add_argument(
+        "--worker-count",
+        type=int,
+        default=1,
+        help="How many processes are generating, so their ids and patients differ",
+    )
+    arguments = parser.parse_args()
+
+    started = time.perf_counter()
+    contexts = generate_contexts(
+        arguments.count,
+        arguments.nomination_code,
+        arguments.line_items,
+        arguments.worker_index,
+        arguments.worker_count,
+    )
+    counts = write_ndjson(
+        generate_lines(contexts, arguments.messages),
+        arguments.messages,
+        arguments.output_directory,
+    )
+    elapsed = time.perf_counter() - started
+    for kind, count in counts.items():
+        file_path = os.path.join(arguments.output_directory, MESSAGES[kind][0])
+        print(f"{count} {kind} messages written to {file_path}")
+    print(f"in {elapsed:.1f}s ({arguments.count / elapsed:.0f} prescriptions/s)")
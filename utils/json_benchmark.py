@@ -0,0 +1,86 @@
+#####################################################################
+# Compares parsing and serialising the validator examples in        #
+# messages/examples with the standard library and with orjson, and  #
+# parsing a response once per step with parsing it once per chain.  #
+# Run with: python -m utils.json_benchmark                          #
+#####################################################################
+
+import argparse
+import json
+import os
+import timeit
+from types import SimpleNamespace
+
+from methods.shared.json_backend import JSON_BACKEND, orjson, response_json
+
+EXAMPLES_DIRECTORY = os.path.join("messages", "examples")
+# about how many steps check each response in a scenario
+CHECKS_PER_RESPONSE = 4
+
+
+def load_corpus():
+    corpus = []
+    for name in sorted(os.listdir(EXAMPLES_DIRECTORY)):
+        for file_name in ("request.json", "response.json"):
+            with open(os.path.join(EXAMPLES_DIRECTORY, name, file_name), "rb") as f:
+                corpus.append(f.read())
+    return corpus
+
+
+def milliseconds(statement, number):
+    return min(timeit.repeat(statement, number=number, repeat=3)) / number * 1000
+
+
+def time_backends(corpus, number):
+    documents = [json.loads(data) for data in corpus]
+    backends: dict = {"json": (json.loads, json.dumps)}
+    if orjson is not None:
+        backends["orjson"] = (orjson.loads, orjson.dumps)
+    else:
+        print("orjson is not installed, only the standard library is timed")
+
+    print(f"{'backend':<10} {'parse':>10} {'serialise':>10}  (ms for the corpus)")
+    for name, (loads, dumps) in backends.items():
+        parse = milliseconds(lambda: [loads(data) for data in corpus], number)
+        serialise = milliseconds(
+            lambda: [dumps(document) for document in documents], number
+        )
+        print(f"{name:<10} {parse:>10.3f} {serialise:>10.3f}")
+
+
+def time_response_parsing(corpus, number):
+    def parse_every_check():
+        for data in corpus:
+            response = SimpleNamespace(content=data)
+            for _ in range(CHECKS_PER_RESPONSE):
+                json.loads(response.content)
+
+    def parse_once_per_response():
+        for data in corpus:
+            response = SimpleNamespace(content=data)
+            for _ in range(CHECKS_PER_RESPONSE):
+                response_json(response)
+
+    print(f"checking each response {CHECKS_PER_RESPONSE} times (ms for the corpus)")
+    for name, statement in (
+        ("parsed by every check", parse_every_check),
+        ("parsed once, response_json", parse_once_per_response),
+    ):
+        print(f"{name:<28} {milliseconds(statement, number):>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the JSON backends over the validator examples"
+    )
+    parser.add_argument("--number", type=int, default=200)
+    arguments = parser.parse_args()
+
+    corpus = load_corpus()
+    print(
+        f"{len(corpus)} documents, {sum(len(data) for data in corpus)} bytes,"
+        f" JSON_BACKEND={JSON_BACKEND}"
+    )
+    time_backends(corpus, arguments.number)
+    print()
+    time_response_parsing(corpus, arguments.number)
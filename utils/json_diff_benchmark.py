@@ -0,0 +1,73 @@
+#####################################################################
+# Compares jycm with methods/shared/json_diff.py over the validator #
+# responses in messages/examples: a response matching its file, one #
+# with its issues in another order and one with a changed issue.    #
+# Run with: python -m utils.json_diff_benchmark                     #
+#####################################################################
+
+import argparse
+import copy
+import os
+import timeit
+
+from jycm.jycm import YouchamaJsonDiffer
+
+from methods.shared.json_backend import load_file
+from methods.shared.json_diff import diff_json
+
+EXAMPLES_DIRECTORY = os.path.join("messages", "examples")
+
+
+def load_responses():
+    return {
+        name: load_file(os.path.join(EXAMPLES_DIRECTORY, name, "response.json"))
+        for name in sorted(os.listdir(EXAMPLES_DIRECTORY))
+    }
+
+
+def variants(expected):
+    # (description, actual response, whether it should match)
+    reordered = copy.deepcopy(expected)
+    reordered["issue"].reverse()
+    changed = copy.deepcopy(expected)
+    changed["issue"][-1]["diagnostics"] = "changed"
+    return (
+        ("matching", copy.deepcopy(expected), True),
+        ("issues reordered", reordered, True),
+        ("last issue changed", changed, False),
+    )
+
+
+def jycm_matches(expected, actual):
+    differ = YouchamaJsonDiffer(expected, actual)
+    return differ.get_diff() == {"just4vis:pairs": []}
+
+
+def milliseconds(statement, number):
+    return min(timeit.repeat(statement, number=number, repeat=3)) / number * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark jycm against json_diff over the validator examples"
+    )
+    parser.add_argument("--number", type=int, default=20)
+    arguments = parser.parse_args()
+
+    comparers = {
+        "jycm": jycm_matches,
+        "json_diff fast": lambda e, a: not diff_json(e, a, fast=True),
+        "json_diff verbose": lambda e, a: not diff_json(e, a),
+    }
+    print(f"{'response':<34} {'case':<19}" + "".join(f"{c:>18}" for c in comparers))
+    for name, expected in load_responses().items():
+        for case, actual, should_match in variants(expected):
+            timings = []
+            for comparer in comparers.values():
+                matched = comparer(expected, actual)
+                timing = milliseconds(
+                    lambda: comparer(expected, actual), arguments.number
+                )
+                timings.append(f"{timing:>8.3f}ms {'match' if matched else 'diff':>5}")
+            print(f"{name:<34} {case:<19}" + "".join(f"{t:>18}" for t in timings))
+    print("json_diff ignores issue order, jycm compares issues in order")
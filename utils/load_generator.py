@@ -0,0 +1,324 @@
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+# eps_api_methods has to be imported before methods.shared.common
+from methods.api import eps_api_methods
+from features.environment import (
+    CERTIFICATE,
+    EPS_FHIR_DISPENSING_SUFFIX,
+    EPS_FHIR_PRESCRIBING_SUFFIX,
+    EPS_FHIR_SUFFIX,
+    PRIVATE_KEY,
+    select_apigee_base_url,
+)
+from messages.eps_fhir.medications import MAX_LINE_ITEMS
+from messages.eps_fhir.prescription import SENDER_ODS_CODE
+from methods.shared import latency
+from methods.shared.common import get_auth
+from utils import signing
+from utils.prescription_id_generator import ShortFormIdGenerator
+from utils.random_nhs_number_generator import NhsNumberPool
+
+LOAD_REPORT_PATH = "reports/load_report.json"
+
+# step name, step, user the step is made as
+LIFECYCLE = (
+    ("prepare", eps_api_methods.prepare_prescription, "prescriber"),
+    ("sign", eps_api_methods.create_signed_prescription, "prescriber"),
+    ("release", eps_api_methods.release_signed_prescription, "dispenser"),
+    ("dispense", eps_api_methods.dispense_prescription, "dispenser"),
+)
+
+
+def create_context(env, product):
+    base_url = select_apigee_base_url(env)
+    context = SimpleNamespace(
+        config=SimpleNamespace(userdata={"env": env, "product": product}),
+        eps_fhir_base_url=os.path.join(base_url, EPS_FHIR_SUFFIX),
+        eps_fhir_prescribing_base_url=os.path.join(
+            base_url, EPS_FHIR_PRESCRIBING_SUFFIX
+        ),
+        eps_fhir_dispensing_base_url=os.path.join(base_url, EPS_FHIR_DISPENSING_SUFFIX),
+    )
+    return context
+
+
+def arrival_time(index, rate, ramp_up):
+    # Start time of the index-th lifecycle when the arrival rate climbs linearly
+    # from 0 to rate over ramp_up seconds and then stays at rate
+    ramp_up_arrivals = rate * ramp_up / 2
+    if index < ramp_up_arrivals:
+        return math.sqrt(2 * ramp_up * index / rate)
+    return ramp_up + (index - ramp_up_arrivals) / rate
+
+
+class LoadResults:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.timings = {name: [] for name, _, _ in LIFECYCLE}
+        self.errors = {name: 0 for name, _, _ in LIFECYCLE}
+        self.error_messages = {}
+        # from each lifecycle's scheduled arrival to when a thread started it,
+        # and to when it finished. Measured from the schedule, the time spent
+        # waiting for a free thread counts against the service, as it would
+        # for a real user, instead of being left out of the figures.
+        self.waiting = []
+        self.lifecycles = []
+        self.started = 0
+        self.completed = 0
+
+    def record(self, name, seconds, error=None):
+        with self.lock:
+            self.timings[name].append(round(seconds * 1000, 3))
+            if error is not None:
+                self.errors[name] += 1
+                message = f"{name}: {error}"[:200]
+                self.error_messages[message] = self.error_messages.get(message, 0) + 1
+
+
+class PatientSource:
+    # The prescription ids and patients of this load worker. Every lifecycle
+    # thread takes from the same generator and pool, so no id or patient is
+    # used twice in a run, or by two workers given different worker indexes.
+    def __init__(self, worker_index=0, worker_count=1) -> None:
+        self.short_form_ids = ShortFormIdGenerator(
+            SENDER_ODS_CODE, worker_index, worker_count
+        )
+        self.nhs_numbers = NhsNumberPool(
+            worker_index=worker_index, worker_count=worker_count
+        )
+
+
+def run_lifecycle(env, product, line_item_count, results, patients, scheduled):
+    # scheduled is the time.perf_counter() the lifecycle was due to start at
+    waited = time.perf_counter() - scheduled
+    context = create_context(env, product)
+    context.short_form_ids = patients.short_form_ids
+    context.nhs_number = patients.nhs_numbers.take_one()
+    context.nomination_code = "P1"
+    context.line_item_count = line_item_count
+    with results.lock:
+        results.started += 1
+        results.waiting.append(round(waited * 1000, 3))
+    for name, step, user in LIFECYCLE:
+        started = time.perf_counter()
+        try:
+            context.auth_token = get_auth(env, "EPS-FHIR", user)
+            step(context)
+            if context.response.status_code != 200:
+                raise AssertionError(f"status code {context.response.status_code}")
+        except Exception as error:
+            # any failure ends this patient's lifecycle and counts against the step
+            results.record(name, time.perf_counter() - started, error)
+            return
+        results.record(name, time.perf_counter() - started)
+    with results.lock:
+        results.completed += 1
+        results.lifecycles.append(round((time.perf_counter() - scheduled) * 1000, 3))
+
+
+def run_load(
+    env,
+    product,
+    rate,
+    ramp_up,
+    duration,
+    concurrency,
+    signing_processes=0,
+    line_item_count=1,
+    worker_index=0,
+    worker_count=1,
+):
+    # the prescribing and dispensing URLs are module globals in eps_api_methods
+    eps_api_methods.calculate_eps_fhir_base_url(create_context(env, product))
+    if signing_processes:
+        with signing.SigningPool(
+            CERTIFICATE,  # pyright: ignore [reportArgumentType]
+            PRIVATE_KEY,  # pyright: ignore [reportArgumentType]
+            signing_processes,
+        ) as pool:
+            signing.use_signer(pool)
+            try:
+                return run_load(
+                    env,
+                    product,
+                    rate,
+                    ramp_up,
+                    duration,
+                    concurrency,
+                    line_item_count=line_item_count,
+                    worker_index=worker_index,
+                    worker_count=worker_count,
+                )
+            finally:
+                signing.use_signer(None)
+    results = LoadResults()
+    patients = PatientSource(worker_index, worker_count)
+    end = ramp_up + duration
+    index = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = time.perf_counter()
+        while (start_at := arrival_time(index, rate, ramp_up)) < end:
+            delay = start_at - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(
+                run_lifecycle,
+                env,
+                product,
+                line_item_count,
+                results,
+                patients,
+                started + start_at,
+            )
+            index += 1
+    elapsed = time.perf_counter() - started
+    return build_report(results, index, elapsed, rate, ramp_up, duration, concurrency)
+
+
+def summarise(values):
+    return latency.summarise({"": values})[""] if values else None
+
+
+def build_report(results, arrivals, elapsed, rate, ramp_up, duration, concurrency):
+    steps = {}
+    for name, values in results.timings.items():
+        if not values:
+            continue
+        steps[name] = latency.summarise({name: values})[name]
+        steps[name]["errors"] = results.errors[name]
+        steps[name]["error_rate"] = round(results.errors[name] / len(values), 4)
+    return {
+        "target": {
+            "rate_per_second": rate,
+            "ramp_up_seconds": ramp_up,
+            "duration_seconds": duration,
+            "concurrency": concurrency,
+        },
+        "arrivals": arrivals,
+        "started": results.started,
+        "completed": results.completed,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(results.completed / elapsed, 3),
+        "steps": steps,
+        "waiting": summarise(results.waiting),
+        "lifecycles": summarise(results.lifecycles),
+        "errors": results.error_messages,
+        "requests": latency.report()["summary"],
+    }
+
+
+def format_report(report):
+    lines = [
+        f"Lifecycles: {report['arrivals']} arrived, {report['completed']} completed"
+        f" in {report['elapsed_seconds']}s"
+        f" ({report['throughput_per_second']}/s achieved,"
+        f" {report['target']['rate_per_second']}/s target)",
+        f"{'step':<10} {'count':>6} {'errors':>7} {'p50':>9} {'p95':>9}"
+        f" {'p99':>9} {'max':>9}",
+    ]
+    for name, stats in report["steps"].items():
+        lines.append(
+            f"{name:<10} {stats['count']:>6} {stats['errors']:>7}"
+            f" {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f}"
+            f" {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}"
+        )
+    # from the scheduled arrival, so time waiting for a thread is included
+    for name in ("waiting", "lifecycles"):
+        stats = report[name]
+        if stats:
+            lines.append(
+                f"{name:<10} {stats['count']:>6} {'':>7}"
+                f" {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f}"
+                f" {stats['p99_ms']:>9.1f} {stats['max_ms']:>9.1f}"
+            )
+    for message, count in report["errors"].items():
+        lines.append(f"{count:>6} x {message}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="runner.py load",
+        description="Drive the prescription lifecycle at a target rate",
+    )
+    parser.add_argument("--env", required=True, help="The environment to load")
+    parser.add_argument(
+        "--product",
+        default="EPS-FHIR",
+        choices=["EPS-FHIR", "EPS-FHIR-PRESCRIBING", "EPS-FHIR-DISPENSING"],
+    )
+    parser.add_argument(
+        "--rate", type=float, required=True, help="Lifecycles started per second"
+    )
+    parser.add_argument(
+        "--ramp-up",
+        type=float,
+        default=0,
+        help="Seconds to climb linearly to the target rate",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        required=True,
+        help="Seconds to hold the target rate after ramping up",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=50,
+        help="Maximum number of lifecycles in flight",
+    )
+    parser.add_argument(
+        "--line-items",
+        type=int,
+        default=1,
+        choices=range(1, MAX_LINE_ITEMS + 1),
+        metavar=f"1-{MAX_LINE_ITEMS}",
+        help="Line items on each prescription",
+    )
+    parser.add_argument(
+        "--signing-processes",
+        type=int,
+        default=0,
+        help="Sign prescriptions across this many processes instead of in threads",
+    )
+    parser.add_argument(
+        "--worker-index",
+        type=int,
+        default=0,
+        help="When loading from several processes, which one this is",
+    )
+    parser.add_argument(
+        "--worker-count",
+        type=int,
+        default=1,
+        help="How many processes are loading, so their ids and patients differ",
+    )
+    parser.add_argument("--report", default=LOAD_REPORT_PATH)
+    arguments = parser.parse_args(argv)
+
+    report = run_load(
+        arguments.env.upper(),
+        arguments.product.upper(),
+        arguments.rate,
+        arguments.ramp_up,
+        arguments.duration,
+        arguments.concurrency,
+        arguments.signing_processes,
+        arguments.line_items,
+        arguments.worker_index,
+        arguments.worker_count,
+    )
+    print(format_report(report))
+    directory = os.path.dirname(arguments.report)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(arguments.report, "w") as report_file:
+        json.dump(report, report_file, indent=2)
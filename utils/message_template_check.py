@@ -0,0 +1,70 @@
+#####################################################################
+# Compares the cost of building and serialising each message with  #
+# rendering it from its template. tests/test_message_templates.py   #
+# checks the templates match the original builders.                 #
+# Run with: python -m utils.message_template_check                  #
+#####################################################################
+
+import argparse
+import timeit
+from types import SimpleNamespace
+
+# eps_api_methods has to be imported before features.environment
+import methods.api.eps_api_methods  # noqa: F401
+from messages.eps_fhir.dispense_notification import DispenseNotification
+from messages.eps_fhir.medications import MAX_LINE_ITEMS
+from messages.eps_fhir.prescription import Prescription
+from messages.eps_fhir.prescription_return import Return
+from messages.eps_fhir.release import Release
+from methods.shared.json_backend import dumps
+from messages.eps_fhir.withdraw_dispense_notification import (
+    WithdrawDispenseNotification,
+)
+from utils.random_nhs_number_generator import generate_single
+
+# message name -> function making the message from a context
+MESSAGES = {
+    "prescription": Prescription,
+    "release": Release,
+    "dispense notification": lambda context: DispenseNotification(context, False),
+    "amended dispense notification": lambda context: DispenseNotification(
+        context, True
+    ),
+    "withdraw dispense notification": WithdrawDispenseNotification,
+    "return": Return,
+}
+
+
+def create_context(nomination_code, line_item_count=1):
+    return SimpleNamespace(
+        nhs_number=generate_single(),
+        nomination_code=nomination_code,
+        line_item_count=line_item_count,
+    )
+
+
+def microseconds(statement, number):
+    return min(timeit.repeat(statement, number=number, repeat=3)) / number * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time building messages against rendering their templates"
+    )
+    parser.add_argument("--number", type=int, default=1000)
+    parser.add_argument(
+        "--line-items",
+        type=int,
+        default=1,
+        choices=range(1, MAX_LINE_ITEMS + 1),
+        metavar=f"1-{MAX_LINE_ITEMS}",
+    )
+    arguments = parser.parse_args()
+
+    context = create_context("P1", arguments.line_items)
+    print(f"{'message':<32} {'builder':>10} {'template':>10}")
+    for name, create_message in MESSAGES.items():
+        message = create_message(context)
+        built = microseconds(lambda: dumps(message.create_message()), arguments.number)
+        rendered = microseconds(message.render, arguments.number)
+        print(f"{name:<32} {built:>8.1f}us {rendered:>8.1f}us")
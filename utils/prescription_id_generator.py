@@ -1,6 +1,50 @@
+import argparse
+import functools
+import logging
+import random
+import re
+import threading
 import uuid
 
 CHECK_DIGIT_VALUES = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ+"
+# the value of each character, as int(character, 36) gives
+CHARACTER_VALUES = {
+    character: int(character, 36)
+    for character in CHECK_DIGIT_VALUES[:36] + CHECK_DIGIT_VALUES[10:36].lower()
+}
+SHORT_FORM_ID_PATTERN = re.compile(r"[0-9A-F]{6}-[0-9A-Z]{6}-[0-9A-F]{5}[0-9A-Z+]")
+
+# The 11 hex digits of a short form id, 6 before the ODS code and 5 after it,
+# and their positions in the id without dashes
+HEX_DIGITS = 11
+HEX_POSITIONS = tuple(range(6)) + tuple(range(12, 17))
+ID_SPACE = 16**HEX_DIGITS
+
+
+@functools.lru_cache
+def position_weights(length):
+    # 2 ** (length - index) for each position, reduced mod 37 up front so the
+    # check digit doesn't need big powers of 2
+    return tuple(pow(2, length - index, 37) for index in range(length))
+
+
+# for each hex digit of an id, what each character adds to the check total
+HEX_DIGIT_TOTALS = tuple(
+    {
+        character: CHARACTER_VALUES[character] * position_weights(17)[position] % 37
+        for character in "0123456789ABCDEF"
+    }
+    for position in HEX_POSITIONS
+)
+
+
+def check_value(characters):
+    weights = position_weights(len(characters))
+    running_total = sum(
+        CHARACTER_VALUES[character] * weight
+        for character, weight in zip(characters, weights)
+    )
+    return (38 - (running_total % 37)) % 37
 
 
 def generate_short_form_id(ods_code=None, original_short_form_id=None) -> str:
@@ -16,25 +60,104 @@ def generate_short_form_id(ods_code=None, original_short_form_id=None) -> str:
     last = hex_string[12:17]
     prescription_id = f"{first}-{middle}-{last}"
     prescription_id = generate_check_digit(prescription_id)
-    print("Generated prescription id:", prescription_id)
+    logging.debug("Generated prescription id: %s", prescription_id)
     return prescription_id
 
 
 def generate_check_digit(prescription_id):
     formatted_prescription_id = prescription_id.replace("-", "")
-    prescription_id_length = len(formatted_prescription_id)
-    running_total = 0
-    for index, character in enumerate(formatted_prescription_id):
-        running_total += int(character, 36) * 2 ** (prescription_id_length - index)
-    check_value = (38 - (running_total % 37)) % 37
-    check_digit = CHECK_DIGIT_VALUES[check_value]
+    check_digit = CHECK_DIGIT_VALUES[check_value(formatted_prescription_id)]
     prescription_id += check_digit
     return prescription_id
 
 
-# Example usage:
+class ShortFormIdGenerator:
+    # Makes short form ids for one ODS code without repeating any. The hex
+    # digits of the ids are split into a block for each worker process, and
+    # each worker counts up from a random point in its own block, so ids are
+    # unique within a run and across the workers of a run. Iterating over it
+    # gives one id after another, and threads can share it.
+    def __init__(self, ods_code, worker_index=0, worker_count=1) -> None:
+        if not 0 <= worker_index < worker_count:
+            raise ValueError(
+                f"Worker {worker_index} is not one of {worker_count} workers"
+            )
+        self.middle = ods_code.zfill(6)
+        weights = position_weights(17)[6:12]
+        self.middle_total = sum(
+            CHARACTER_VALUES[character] * weight
+            for character, weight in zip(self.middle, weights)
+        )
+        self.block_size = ID_SPACE // worker_count
+        self.block_start = worker_index * self.block_size
+        self.offset = random.randrange(self.block_size)
+        self.issued = 0
+        self.lock = threading.Lock()
+
+    def reserve(self, count):
+        # the serial numbers of the next count ids
+        with self.lock:
+            if self.issued + count > self.block_size:
+                raise ValueError(
+                    f"Only {self.block_size - self.issued} more unique ids can be made"
+                )
+            start = self.issued
+            self.issued += count
+        return range(start, start + count)
+
+    def make_id(self, serial):
+        position = self.block_start + (self.offset + serial) % self.block_size
+        hex_string = f"{position:011X}"
+        running_total = self.middle_total
+        for digit_totals, character in zip(HEX_DIGIT_TOTALS, hex_string):
+            running_total += digit_totals[character]
+        check_digit = CHECK_DIGIT_VALUES[(38 - (running_total % 37)) % 37]
+        return f"{hex_string[:6]}-{self.middle}-{hex_string[6:]}{check_digit}"
+
+    def generate(self, count):
+        # count new ids, made as they are iterated over
+        return map(self.make_id, self.reserve(count))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.make_id(self.reserve(1)[0])
+
+
+def generate_short_form_ids(ods_code, count, worker_index=0, worker_count=1):
+    return ShortFormIdGenerator(ods_code, worker_index, worker_count).generate(count)
+
+
+def is_valid_short_form_id(prescription_id):
+    if not SHORT_FORM_ID_PATTERN.fullmatch(prescription_id):
+        return False
+    formatted_prescription_id = prescription_id.replace("-", "")
+    expected = CHECK_DIGIT_VALUES[check_value(formatted_prescription_id[:-1])]
+    return formatted_prescription_id[-1] == expected
+
+
+def invalid_short_form_ids(prescription_ids):
+    # the ids with a bad format or check digit, so a whole batch is checked at once
+    return [
+        prescription_id
+        for prescription_id in prescription_ids
+        if not is_valid_short_form_id(prescription_id)
+    ]
+
+
 if __name__ == "__main__":
-    generated_prescription_id = generate_short_form_id(
-        ods_code="X26", original_short_form_id=None
-    )
-    print(generated_prescription_id)
+    parser = argparse.ArgumentParser(description="Generate short form prescription ids")
+    parser.add_argument("--ods-code", default="X26")
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--worker-index", type=int, default=0)
+    parser.add_argument("--worker-count", type=int, default=1)
+    arguments = parser.parse_args()
+
+    for generated_prescription_id in generate_short_form_ids(
+        arguments.ods_code,
+        arguments.count,
+        arguments.worker_index,
+        arguments.worker_count,
+    ):
+        print(generated_prescription_id)
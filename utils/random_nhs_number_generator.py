@@ -1,35 +1,130 @@
-from nhs_number_generator.generate_nhs_numbers import random_nhs_number_generator
-
-
-def generate_multiple(
-    nhs_number_range=(
-        (311300000, 319999999),
-        (400000000, 499999999),
-        (600000000, 799999999),
-    ),
-    amount_to_generate=1,
-):
-    numbers = [
-        next(random_nhs_number_generator(nhs_number_range))
-        for _ in range(amount_to_generate)
-    ]
-    # Keep only one of each
-    unique_numbers = set(numbers)
-    return unique_numbers
-
-
-def generate_single(
-    nhs_number_range=(
-        (311300000, 319999999),
-        (400000000, 499999999),
-        (600000000, 799999999),
+import collections
+import logging
+import math
+import os
+import random
+import threading
+
+NHS_NUMBER_RANGES = (
+    (311300000, 319999999),
+    (400000000, 499999999),
+    (600000000, 799999999),
+)
+# the weight of each of the first 9 digits in the mod 11 check digit
+CHECK_DIGIT_WEIGHTS = (10, 9, 8, 7, 6, 5, 4, 3, 2)
+# how many numbers the pool makes at a time
+BLOCK_SIZE = 1000
+# "index/count" of this process among the processes of a run, set by the runner
+# for its workers so they never get the same NHS numbers
+NHS_NUMBER_WORKER = os.getenv("NHS_NUMBER_WORKER", "0/1")
+
+
+def calculate_check_digit(base):
+    # None when there is no valid NHS number with these first 9 digits
+    total = sum(
+        int(digit) * weight for digit, weight in zip(f"{base:09d}", CHECK_DIGIT_WEIGHTS)
     )
-):
-    numbers = [next(random_nhs_number_generator(nhs_number_range)) for _ in range(1)]
-    # Keep only one of each
-    unique_numbers = set(numbers).pop()
-    print("NHS Number: ", unique_numbers)
-    return unique_numbers
+    check_digit = 11 - total % 11
+    if check_digit == 11:
+        return 0
+    return None if check_digit == 10 else check_digit
+
+
+class NhsNumberPool:
+    # Hands out valid test NHS numbers without giving any of them out twice.
+    # The first 9 digits of the numbers in the ranges are shared out between
+    # the worker processes of a run, every worker_count-th one to each worker,
+    # and each worker goes through its share in a random order, so no patient
+    # is used twice in a run however many workers there are.
+    def __init__(
+        self,
+        nhs_number_range=NHS_NUMBER_RANGES,
+        worker_index=0,
+        worker_count=1,
+        block_size=BLOCK_SIZE,
+    ) -> None:
+        if not 0 <= worker_index < worker_count:
+            raise ValueError(
+                f"Worker {worker_index} is not one of {worker_count} workers"
+            )
+        self.ranges = nhs_number_range
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self.block_size = block_size
+        total = sum(high - low + 1 for low, high in self.ranges)
+        self.size = len(range(worker_index, total, worker_count))
+        # a random start and a step with no factor in common with the size
+        # visit every base in the share once, in a random looking order
+        self.start = random.randrange(self.size)
+        self.step = 1
+        while self.size > 1 and self.step == 1:
+            step = random.randrange(1, self.size)
+            if math.gcd(step, self.size) == 1:
+                self.step = step
+        self.position = 0
+        self.block = collections.deque()
+        self.lock = threading.Lock()
+
+    def base(self, position):
+        offset = (
+            self.worker_index
+            + (self.start + position * self.step) % self.size * self.worker_count
+        )
+        for low, high in self.ranges:
+            if offset <= high - low:
+                return low + offset
+            offset -= high - low + 1
+        raise ValueError(f"Position {position} is outside the NHS number ranges")
+
+    def fill(self):
+        # the next block of valid numbers, skipping bases with no check digit
+        while len(self.block) < self.block_size and self.position < self.size:
+            base = self.base(self.position)
+            self.position += 1
+            check_digit = calculate_check_digit(base)
+            if check_digit is not None:
+                self.block.append(f"{base:09d}{check_digit}")
+
+    def take(self, count=1):
+        numbers = []
+        with self.lock:
+            while len(numbers) < count:
+                if not self.block:
+                    self.fill()
+                if not self.block:
+                    raise ValueError("Every NHS number in the ranges has been used")
+                numbers.append(self.block.popleft())
+        return numbers
+
+    def take_one(self):
+        return self.take()[0]
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_nhs_number_pool(nhs_number_range=NHS_NUMBER_RANGES):
+    # One pool per range for the whole process, so threads share it too
+    with _pools_lock:
+        if nhs_number_range not in _pools:
+            worker_index, worker_count = (
+                int(part) for part in NHS_NUMBER_WORKER.split("/")
+            )
+            _pools[nhs_number_range] = NhsNumberPool(
+                nhs_number_range, worker_index, worker_count
+            )
+        return _pools[nhs_number_range]
+
+
+def generate_multiple(nhs_number_range=NHS_NUMBER_RANGES, amount_to_generate=1):
+    return set(get_nhs_number_pool(nhs_number_range).take(amount_to_generate))
+
+
+def generate_single(nhs_number_range=NHS_NUMBER_RANGES):
+    nhs_number = get_nhs_number_pool(nhs_number_range).take_one()
+    logging.debug("NHS Number: %s", nhs_number)
+    return nhs_number
 
 
 if __name__ == "__main__":
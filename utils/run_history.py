@@ -0,0 +1,158 @@
+import argparse
+import os
+import sqlite3
+import time
+from uuid import uuid4
+
+HISTORY_DATABASE_PATH = os.getenv("RUN_HISTORY_DATABASE", "reports/run_history.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    run_id TEXT NOT NULL,
+    product TEXT NOT NULL,
+    env TEXT NOT NULL,
+    location TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id TEXT NOT NULL,
+    product TEXT NOT NULL,
+    env TEXT NOT NULL,
+    scenario_location TEXT NOT NULL,
+    location TEXT NOT NULL,
+    keyword TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenarios_by_product ON scenarios (product, location);
+CREATE INDEX IF NOT EXISTS steps_by_scenario ON steps (scenario_location);
+"""
+
+
+def connect(database_path=HISTORY_DATABASE_PATH):
+    directory = os.path.dirname(database_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # parallel workers write to the same database, so wait for each other's locks
+    connection = sqlite3.connect(database_path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class RunHistory:
+    def __init__(self, product, env, run_id=None, database_path=HISTORY_DATABASE_PATH):
+        self.product = product
+        self.env = env
+        self.run_id = run_id or str(uuid4())
+        self.connection = connect(database_path)
+        self.steps = []
+
+    def record_step(self, scenario, step):
+        self.steps.append(
+            (
+                self.run_id,
+                self.product,
+                self.env,
+                str(scenario.location),
+                str(step.location),
+                step.keyword,
+                step.name,
+                step.status.name,
+                step.duration,
+                time.time(),
+            )
+        )
+
+    def record_scenario(self, scenario):
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO scenarios VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.run_id,
+                    self.product,
+                    self.env,
+                    str(scenario.location),
+                    scenario.feature.name,
+                    scenario.name,
+                    scenario.status.name,
+                    scenario.duration,
+                    time.time(),
+                ),
+            )
+            self.connection.executemany(
+                "INSERT INTO steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self.steps
+            )
+        self.steps = []
+
+    def close(self):
+        self.connection.close()
+
+
+def scenario_durations(product, env=None, recent_runs=5, database_path=None):
+    # Mean duration of each scenario's most recent passing runs, keyed by location
+    database_path = database_path or HISTORY_DATABASE_PATH
+    if not os.path.exists(database_path):
+        return {}
+    connection = connect(database_path)
+    try:
+        rows = connection.execute(
+            """
+            SELECT location, AVG(duration) FROM (
+                SELECT location, duration, ROW_NUMBER() OVER (
+                    PARTITION BY location ORDER BY finished_at DESC
+                ) AS recency
+                FROM scenarios
+                WHERE product = ? AND (? IS NULL OR env = ?) AND status = 'passed'
+            )
+            WHERE recency <= ?
+            GROUP BY location
+            """,
+            (product, env, env, recent_runs),
+        ).fetchall()
+    finally:
+        connection.close()
+    return dict(rows)
+
+
+def scenario_trends(product, env=None, database_path=None):
+    # Latest passing duration of each scenario against the mean of all earlier ones
+    connection = connect(database_path or HISTORY_DATABASE_PATH)
+    try:
+        return connection.execute(
+            """
+            SELECT location, name, COUNT(*), AVG(duration),
+                (SELECT duration FROM scenarios AS latest
+                 WHERE latest.location = scenarios.location
+                 AND latest.product = scenarios.product AND latest.status = 'passed'
+                 AND (? IS NULL OR latest.env = ?)
+                 ORDER BY finished_at DESC LIMIT 1)
+            FROM scenarios
+            WHERE product = ? AND (? IS NULL OR env = ?) AND status = 'passed'
+            GROUP BY location
+            ORDER BY AVG(duration) DESC
+            """,
+            (env, env, product, env, env),
+        ).fetchall()
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show scenario duration trends")
+    parser.add_argument("--product", required=True)
+    parser.add_argument("--env", required=False)
+    parser.add_argument("--database", default=HISTORY_DATABASE_PATH)
+    arguments = parser.parse_args()
+
+    print(f"{'mean (s)':>9} {'latest (s)':>10} {'runs':>5}  scenario")
+    for location, name, runs, mean, latest in scenario_trends(
+        arguments.product.upper(), arguments.env, arguments.database
+    ):
+        print(f"{mean:9.2f} {latest:10.2f} {runs:5d}  {location} {name}")
@@ -7,22 +7,31 @@
 #####################################################################
 
 import base64
+import collections
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives.serialization import Encoding, load_pem_private_key
+from cryptography.hazmat.primitives.serialization import (
+    Encoding,
+    PublicFormat,
+    load_pem_private_key,
+)
 from cryptography.x509 import load_pem_x509_certificate
 from datetime import datetime, timezone
 
-from features.environment import PRIVATE_KEY, CERTIFICATE
-
 DUMMY_SIGNATURE = """
 DQo8U2lnbmF0dXJlIHhtbG5zPSJodHRwOi8vd3d3LnczLm9yZy8yMDAwLz\
 A5L3htbGRzaWcjIj4NCiAgICA8U2lnbmVkSW5mbz48Q2Fub25pY2FsaXph\
 dGlvbk1ldGhvZCBBbGdvcml0aG09Imh0dHA6Ly93d3cudzMub3JnLzIwMD\
 EvMTAveG1sLWV4Yy1jMTRuIyI
 """
+SIGNING_ALGORITHMS = {"RS256": hashes.SHA256, "RS1": hashes.SHA1}
 
 
 def verify_certificate_valid_when_signed(signature_date, certificate):
@@ -31,66 +40,183 @@ def verify_certificate_valid_when_signed(signature_date, certificate):
     return certificate_start_date <= signature_date <= certificate_end_date
 
 
-def get_signature(digest: str, algorithm: str):
-    # Load X.509 certificate
-    x509_cert = load_pem_x509_certificate(
-        CERTIFICATE.encode("utf-8"),  # pyright: ignore [reportOptionalMemberAccess]
-        default_backend(),
-    )
-
-    # Load private key
-    private_key = load_pem_private_key(
-        PRIVATE_KEY.encode("utf-8"),  # pyright: ignore [reportOptionalMemberAccess]
-        password=None,
-        backend=default_backend(),
-    )
-
-    # Get the current date (signature date)
-    signature_date = datetime.now(timezone.utc)
-
-    # Check if the certificate has expired
-    if not verify_certificate_valid_when_signed(signature_date, x509_cert):
-        raise RuntimeError(
-            "Certificate has expired. You may need to generate a new one."
+class Signer:
+    # Loads and checks the key pair once so each signature only costs the RSA
+    # operation itself
+    def __init__(self, certificate_pem: str, private_key_pem: str) -> None:
+        # Load X.509 certificate
+        x509_cert = load_pem_x509_certificate(
+            certificate_pem.encode("utf-8"), default_backend()
+        )
+
+        # Load private key
+        self.private_key = load_pem_private_key(
+            private_key_pem.encode("utf-8"),
+            password=None,
+            backend=default_backend(),
         )
 
-    # check if X.509 certificate has expired
-    if x509_cert.not_valid_after_utc < datetime.now(timezone.utc):
-        raise RuntimeError("Signing certificate has expired")
-
-    # Decode digest
-    digest = base64.b64decode(digest).decode("utf-8")
-
-    # Set signing algorithm from prepare response
-    signing_algorithm = None
-
-    if algorithm == "RS256":
-        signing_algorithm = hashes.SHA256()
-    elif algorithm == "RS1":
-        signing_algorithm = hashes.SHA1()
-    else:
-        raise ValueError("Unsupported algorithm {}".format(algorithm))
-
-    # Generate signature
-    signature_raw = private_key.sign(  # pyright: ignore [reportAttributeAccessIssue]
-        digest.encode("utf-8"),
-        padding.PKCS1v15(),  # pyright: ignore [reportCallIssue]
-        signing_algorithm,  # pyright: ignore [reportCallIssue]
-    )
-    # Align format of signature with equivalent TypeScript code
-    signature = base64.b64encode(signature_raw).decode("ASCII")
-    # Prepare values for insertion into XML signature
-    digest_without_namespace = digest.replace(
-        'xmlns="http://www.w3.org/2000/09/xmldsig#"', ""
-    )
-    cert_public_bytes = x509_cert.public_bytes(encoding=Encoding.DER)
-    cert_string = base64.b64encode(cert_public_bytes).decode("utf-8")
-
-    # Load template and insert prepared values
-    xml_d_sig = f"""<Signature xmlns="http://www.w3.org/2000/09/xmldsig#">{digest_without_namespace}\
-    <SignatureValue>{signature}</SignatureValue><KeyInfo><X509Data><X509Certificate>{cert_string}\
+        if not verify_certificate_valid_when_signed(
+            datetime.now(timezone.utc), x509_cert
+        ):
+            raise RuntimeError(
+                "Certificate has expired. You may need to generate a new one."
+            )
+        if self.private_key.public_key().public_bytes(
+            Encoding.DER, PublicFormat.SubjectPublicKeyInfo
+        ) != x509_cert.public_key().public_bytes(
+            Encoding.DER, PublicFormat.SubjectPublicKeyInfo
+        ):
+            raise RuntimeError("Private key does not match the signing certificate")
+        self.x509_cert = x509_cert
+
+        cert_public_bytes = x509_cert.public_bytes(encoding=Encoding.DER)
+        cert_string = base64.b64encode(cert_public_bytes).decode("utf-8")
+        # Everything in the XML signature after the signature value
+        self.key_info = f"""</SignatureValue><KeyInfo><X509Data><X509Certificate>{cert_string}\
     </X509Certificate></X509Data></KeyInfo></Signature>"""
 
-    # Match returned signature data with that from equivalent TypeScript code
-    signature_data = base64.b64encode(xml_d_sig.encode("utf-8")).decode("utf-8")
-    return signature_data
+    def sign(self, digest: str, algorithm: str):
+        # Get the current date (signature date)
+        signature_date = datetime.now(timezone.utc)
+
+        # Check the certificate is still valid, as a signer can outlive it
+        if not verify_certificate_valid_when_signed(signature_date, self.x509_cert):
+            raise RuntimeError("Signing certificate has expired")
+
+        # Set signing algorithm from prepare response
+        signing_algorithm = SIGNING_ALGORITHMS.get(algorithm)
+        if signing_algorithm is None:
+            raise ValueError("Unsupported algorithm {}".format(algorithm))
+
+        # Decode digest
+        digest = base64.b64decode(digest).decode("utf-8")
+
+        # Generate signature
+        signature_raw = (
+            self.private_key.sign(  # pyright: ignore [reportAttributeAccessIssue]
+                digest.encode("utf-8"),
+                padding.PKCS1v15(),  # pyright: ignore [reportCallIssue]
+                signing_algorithm(),  # pyright: ignore [reportCallIssue]
+            )
+        )
+        # Align format of signature with equivalent TypeScript code
+        signature = base64.b64encode(signature_raw).decode("ASCII")
+        # Prepare values for insertion into XML signature
+        digest_without_namespace = digest.replace(
+            'xmlns="http://www.w3.org/2000/09/xmldsig#"', ""
+        )
+
+        # Load template and insert prepared values
+        xml_d_sig = f"""<Signature xmlns="http://www.w3.org/2000/09/xmldsig#">{digest_without_namespace}\
+    <SignatureValue>{signature}{self.key_info}"""
+
+        # Match returned signature data with that from equivalent TypeScript code
+        signature_data = base64.b64encode(xml_d_sig.encode("utf-8")).decode("utf-8")
+        return signature_data
+
+
+# The Signer each pool process loads once when it starts
+_process_signer = None
+
+
+def _start_signing_process(certificate_pem, private_key_pem):
+    global _process_signer
+    _process_signer = Signer(certificate_pem, private_key_pem)
+
+
+def _sign_in_process(digest_and_algorithm):
+    return _process_signer.sign(*digest_and_algorithm)  # pyright: ignore
+
+
+def _signing_process_id():
+    # busy for a moment, so the pool hands the others to other processes
+    time.sleep(0.01)
+    return os.getpid()
+
+
+def _sign_chunk_in_process(digests_and_algorithms):
+    return [_sign_in_process(pair) for pair in digests_and_algorithms]
+
+
+class SigningPool:
+    # Signs across processes so the signing rate scales with the cores available
+    # instead of being held to one core by the GIL
+    def __init__(self, certificate_pem: str, private_key_pem: str, processes=None):
+        # fail here rather than with a broken pool if the key pair is unusable
+        Signer(certificate_pem, private_key_pem)
+        self.processes = processes or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            # spawn, as forking a process with running threads is unsafe
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_start_signing_process,
+            initargs=(certificate_pem, private_key_pem),
+        )
+
+    def warm_up(self):
+        # Starts every process and waits until each has loaded the key pair,
+        # as a process only takes work once its initializer has run
+        ready = set()
+        while len(ready) < self.processes:
+            futures = [
+                self.executor.submit(_signing_process_id) for _ in range(self.processes)
+            ]
+            ready.update(future.result() for future in futures)
+
+    def sign(self, digest: str, algorithm: str):
+        return self.executor.submit(_sign_in_process, (digest, algorithm)).result()
+
+    def sign_batch(self, digests_and_algorithms, chunksize=16):
+        # Yields the signatures in the order of the (digest, algorithm) pairs,
+        # each as soon as it and those before it are ready. The pairs are sent
+        # in chunks, with at most two chunks per process queued or being
+        # signed, so a large or generated batch is read as it is signed
+        # rather than all at once.
+        in_flight = collections.deque()
+        try:
+            for chunk in itertools.batched(digests_and_algorithms, chunksize):
+                if len(in_flight) >= 2 * self.processes:
+                    yield from in_flight.popleft().result()
+                in_flight.append(self.executor.submit(_sign_chunk_in_process, chunk))
+            while in_flight:
+                yield from in_flight.popleft().result()
+        finally:
+            # chunks not yet started when the caller stops reading aren't signed
+            for future in in_flight:
+                future.cancel()
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_signer = None
+
+
+def use_signer(signer):
+    # Route get_signature through another signer, e.g. a SigningPool
+    global _signer
+    _signer = signer
+
+
+def get_signer():
+    global _signer
+    if _signer is None:
+        # imported here so pool processes don't load the whole test pack
+        from features.environment import CERTIFICATE, PRIVATE_KEY
+
+        _signer = Signer(
+            CERTIFICATE,  # pyright: ignore [reportArgumentType]
+            PRIVATE_KEY,  # pyright: ignore [reportArgumentType]
+        )
+    return _signer
+
+
+def get_signature(digest: str, algorithm: str):
+    return get_signer().sign(digest, algorithm)
@@ -0,0 +1,126 @@
+#####################################################################
+# Compares the cost of a signature when the key pair is loaded for  #
+# every prescription with reusing one Signer, and the throughput of #
+# signing a batch in one process and across a SigningPool.          #
+# Run with: python -m utils.signing_benchmark                       #
+#####################################################################
+
+import argparse
+import base64
+import time
+import timeit
+from datetime import datetime, timezone
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.serialization import Encoding, load_pem_private_key
+from cryptography.x509 import load_pem_x509_certificate
+
+# eps_api_methods has to be imported before features.environment
+import methods.api.eps_api_methods  # noqa: F401
+from features.environment import CERTIFICATE, PRIVATE_KEY
+from utils.signing import Signer, SigningPool, verify_certificate_valid_when_signed
+
+SIGNED_INFO = (
+    '<SignedInfo xmlns="http://www.w3.org/2000/09/xmldsig#">'
+    '<CanonicalizationMethod Algorithm="http://www.w3.org/2001/10/xml-exc-c14n#"/>'
+    '<SignatureMethod Algorithm="http://www.w3.org/2000/09/xmldsig#rsa-sha1"/>'
+    "<Reference><DigestValue>ZGlnZXN0</DigestValue></Reference></SignedInfo>"
+)
+
+
+def load_and_sign(digest: str, algorithm: str):
+    # get_signature as it was before Signer: the key pair is loaded for every
+    # signature, and checked only for expiry
+    x509_cert = load_pem_x509_certificate(
+        CERTIFICATE.encode("utf-8"),  # pyright: ignore [reportOptionalMemberAccess]
+        default_backend(),
+    )
+    private_key = load_pem_private_key(
+        PRIVATE_KEY.encode("utf-8"),  # pyright: ignore [reportOptionalMemberAccess]
+        password=None,
+        backend=default_backend(),
+    )
+    signature_date = datetime.now(timezone.utc)
+    if not verify_certificate_valid_when_signed(signature_date, x509_cert):
+        raise RuntimeError(
+            "Certificate has expired. You may need to generate a new one."
+        )
+    if x509_cert.not_valid_after_utc < datetime.now(timezone.utc):
+        raise RuntimeError("Signing certificate has expired")
+    digest = base64.b64decode(digest).decode("utf-8")
+    if algorithm == "RS256":
+        signing_algorithm = hashes.SHA256()
+    elif algorithm == "RS1":
+        signing_algorithm = hashes.SHA1()
+    else:
+        raise ValueError("Unsupported algorithm {}".format(algorithm))
+    signature_raw = private_key.sign(  # pyright: ignore [reportAttributeAccessIssue]
+        digest.encode("utf-8"),
+        padding.PKCS1v15(),  # pyright: ignore [reportCallIssue]
+        signing_algorithm,  # pyright: ignore [reportCallIssue]
+    )
+    signature = base64.b64encode(signature_raw).decode("ASCII")
+    digest_without_namespace = digest.replace(
+        'xmlns="http://www.w3.org/2000/09/xmldsig#"', ""
+    )
+    cert_public_bytes = x509_cert.public_bytes(encoding=Encoding.DER)
+    cert_string = base64.b64encode(cert_public_bytes).decode("utf-8")
+    xml_d_sig = f"""<Signature xmlns="http://www.w3.org/2000/09/xmldsig#">{digest_without_namespace}\
+    <SignatureValue>{signature}</SignatureValue><KeyInfo><X509Data><X509Certificate>{cert_string}\
+    </X509Certificate></X509Data></KeyInfo></Signature>"""
+    return base64.b64encode(xml_d_sig.encode("utf-8")).decode("utf-8")
+
+
+def per_signature_microseconds(statement, number, repeat):
+    # best of repeat, as the slower runs are mostly noise from the machine
+    return min(timeit.repeat(statement, number=number, repeat=repeat)) / number * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark signing with and without a reused Signer"
+    )
+    parser.add_argument("--algorithm", default="RS1", choices=["RS1", "RS256"])
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--batch", type=int, default=1000, help="Signatures in the batch comparison"
+    )
+    parser.add_argument(
+        "--processes", type=int, help="Pool processes, defaults to the CPU count"
+    )
+    arguments = parser.parse_args()
+
+    digest = base64.b64encode(SIGNED_INFO.encode("utf-8")).decode("ascii")
+    signer = Signer(CERTIFICATE, PRIVATE_KEY)  # pyright: ignore [reportArgumentType]
+    statements = {
+        "load key pair per signature": lambda: load_and_sign(
+            digest, arguments.algorithm
+        ),
+        "reused signer": lambda: signer.sign(digest, arguments.algorithm),
+    }
+    for name, statement in statements.items():
+        microseconds = per_signature_microseconds(
+            statement, arguments.number, arguments.repeat
+        )
+        print(f"{name:<30} {microseconds:>10.1f} us per signature")
+
+    batch = [(digest, arguments.algorithm)] * arguments.batch
+    started = time.perf_counter()
+    for digest_and_algorithm in batch:
+        signer.sign(*digest_and_algorithm)
+    serial_seconds = time.perf_counter() - started
+    with SigningPool(
+        CERTIFICATE,  # pyright: ignore [reportArgumentType]
+        PRIVATE_KEY,  # pyright: ignore [reportArgumentType]
+        arguments.processes,
+    ) as pool:
+        # every process started and its key pair loaded, so start-up isn't counted
+        pool.warm_up()
+        started = time.perf_counter()
+        list(pool.sign_batch(batch))
+        pool_seconds = time.perf_counter() - started
+    for name, seconds in (("one process", serial_seconds), ("pool", pool_seconds)):
+        print(f"{name:<30} {arguments.batch / seconds:>10.1f} signatures per second")